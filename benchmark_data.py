@@ -0,0 +1,180 @@
+# Data loader throughput benchmark, no model involved, e.g.
+#   python benchmark_data.py --dataroot ./datasets/Day2Night --modes unaligned \
+#       --threads_list 0,2,4,8 --batch_sizes 1,4 --resize_modes resize_and_crop,crop --output bench.json
+# For every combination of dataset_mode, nThreads, batchSize and
+# resize_or_crop it reports images/sec, latency percentiles of the read,
+# decode, transform and collate stages (in ms, per dataset item: a sample,
+# or a whole batch with --decode_backend; collate per batch) and the CPU
+# utilisation of the loader workers, as JSON. The batches come from the
+# trainer's CustomDatasetDataLoader, whose DataLoader is rebuilt around a
+# profiled dataset and collate function with the same sampler, so options
+# like --batch_augment, --decode_backend or --crops_per_decode are measured
+# as train.py runs them.
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.utils.data
+
+from options.train_options import TrainOptions
+from data import profiling
+from data.data_loader import CreateDataLoader
+
+STAGES = ['read', 'decode', 'transform', 'collate']
+
+
+class ProfiledDataset(torch.utils.data.Dataset):
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __getitem__(self, index):
+        profiling.enabled = True
+        profiling.reset()
+        start, cpu_start = time.perf_counter(), time.process_time()
+        item = self.dataset[index]
+        total = time.perf_counter() - start
+        stages = profiling.stages()
+        read, decode = stages.get('read', 0.0), stages.get('decode', 0.0)
+        # a batch of indices (--decode_backend) or a list of crops (--crops_per_decode)
+        images = len(index) if isinstance(index, list) else len(item) if isinstance(item, list) else 1
+        return item, (read, decode, total - read - decode, time.process_time() - cpu_start, images)
+
+    def __len__(self):
+        return len(self.dataset)
+
+
+# the loader's collate function, timed. Without automatic batching it is
+# called once per dataset item.
+class ProfiledCollate():
+    def __init__(self, collate_fn, batched):
+        self.collate_fn = collate_fn
+        self.batched = batched
+
+    def __call__(self, items):
+        if not self.batched:
+            items = [items]
+        timings = [timing for _, timing in items]
+        start = time.perf_counter()
+        batch = self.collate_fn([item for item, _ in items] if self.batched else items[0][0])
+        return batch, timings, time.perf_counter() - start
+
+
+# yields the batches of a profiled DataLoader, keeping their timings
+class ProfiledLoader():
+    def __init__(self, dataloader):
+        kwargs = {'num_workers': dataloader.num_workers, 'pin_memory': dataloader.pin_memory,
+                  'collate_fn': ProfiledCollate(dataloader.collate_fn, dataloader.batch_sampler is not None)}
+        if dataloader.batch_sampler is not None:
+            kwargs['batch_sampler'] = dataloader.batch_sampler
+        else:
+            kwargs.update(sampler=dataloader.sampler, batch_size=None)
+        if getattr(dataloader, 'persistent_workers', False):
+            kwargs['persistent_workers'] = True
+        self.dataloader = torch.utils.data.DataLoader(ProfiledDataset(dataloader.dataset), **kwargs)
+        self.timings = []
+
+    def __iter__(self):
+        for batch, timings, collate in self.dataloader:
+            self.timings.append((timings, collate))
+            yield batch
+
+
+def percentiles(values):
+    if len(values) == 0:
+        return None
+    values = 1000.0 * np.asarray(values)
+    return dict(('p%d' % p, float(np.percentile(values, p))) for p in (50, 90, 99))
+
+
+def run(opt, num_batches, warmup):
+    data_loader = CreateDataLoader(opt)
+    if isinstance(data_loader.dataset, torch.utils.data.IterableDataset):
+        raise ValueError('only map-style dataset modes can be benchmarked')
+    loader = ProfiledLoader(data_loader.dataloader)
+    data_loader.dataloader = loader
+    stages = dict((stage, []) for stage in STAGES)
+    images, worker_cpu = 0, 0.0
+    start = None
+    for i, batch in enumerate(data_loader):
+        if i == warmup:
+            # worker startup and the first prefetch are not measured
+            start = time.perf_counter()
+        timings, loader.timings = loader.timings, []
+        if i >= warmup:
+            for items, collate in timings:
+                for read, decode, transform, cpu, count in items:
+                    stages['read'].append(read)
+                    stages['decode'].append(decode)
+                    stages['transform'].append(transform)
+                    worker_cpu += cpu
+                    images += count
+                stages['collate'].append(collate)
+        if i + 1 >= warmup + num_batches:
+            break
+    wall = time.perf_counter() - start if start is not None else 0.0
+    workers = max(1, opt.nThreads)
+    return {'images': images,
+            'seconds': wall,
+            'images_per_sec': images / wall if wall > 0 else None,
+            'latency_ms': dict((stage, percentiles(values)) for stage, values in stages.items()),
+            'worker_cpu_utilisation': worker_cpu / (wall * workers) if wall > 0 else None}
+
+
+def machine_info():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'host': platform.node(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'python': platform.python_version(), 'torch': torch.__version__, 'commit': commit}
+
+
+def main():
+    options = TrainOptions()
+    options.initialize()
+    parser = options.parser
+    parser.add_argument('--modes', type=str, default='unaligned,aligned,single', help='comma separated dataset_modes')
+    parser.add_argument('--aligned_dataroot', type=str, default='', help='dataroot for aligned, defaults to dataroot')
+    parser.add_argument('--single_dataroot', type=str, default='', help='dataroot for single, defaults to dataroot')
+    parser.add_argument('--threads_list', type=str, default='0,2,4', help='comma separated nThreads to try')
+    parser.add_argument('--batch_sizes', type=str, default='1,4', help='comma separated batchSize to try')
+    parser.add_argument('--resize_modes', type=str, default='resize_and_crop', help='comma separated resize_or_crop to try')
+    parser.add_argument('--num_batches', type=int, default=50, help='# of measured batches per configuration')
+    parser.add_argument('--warmup', type=int, default=5, help='# of batches skipped before measuring')
+    parser.add_argument('--output', type=str, default='', help='write the JSON report here instead of stdout')
+    opt = parser.parse_args()
+    opt.isTrain = True
+    opt.gpu_ids = []
+    dataroots = {'aligned': opt.aligned_dataroot or opt.dataroot, 'single': opt.single_dataroot or opt.dataroot}
+
+    results = []
+    for mode, threads, batch_size, resize in itertools.product(
+            opt.modes.split(','), [int(t) for t in opt.threads_list.split(',')],
+            [int(b) for b in opt.batch_sizes.split(',')], opt.resize_modes.split(',')):
+        config = {'dataset_mode': mode, 'nThreads': threads, 'batchSize': batch_size, 'resize_or_crop': resize}
+        run_opt = type(opt)(**vars(opt))
+        run_opt.dataset_mode, run_opt.nThreads, run_opt.batchSize, run_opt.resize_or_crop = mode, threads, batch_size, resize
+        run_opt.dataroot = dataroots.get(mode, opt.dataroot)
+        print('benchmarking %s' % config, file=sys.stderr)
+        try:
+            config.update(run(run_opt, opt.num_batches, opt.warmup))
+        except (AssertionError, ValueError, OSError, RuntimeError) as e:
+            config['error'] = '%s: %s' % (type(e).__name__, e)
+        results.append(config)
+
+    report = json.dumps({'machine': machine_info(), 'results': results}, indent=2)
+    if opt.output:
+        with open(opt.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
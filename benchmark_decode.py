@@ -0,0 +1,97 @@
+# Decoding benchmark of --decode_backend pil against torchvision, e.g.
+#   python benchmark_decode.py --dataroot ./datasets/Day2Night --folder trainA --batch_sizes 1,8,32 \
+#       --gpu_ids 0 --output decode.json
+# Defaults to the stacked visible/lwir A images of the KAIST-derived dataset.
+# pil reads and decodes every file on its own, as a loader worker does (with
+# the draft size of UnalignedDataset unless --no_draft); torchvision reads
+# the files of a batch at once and decodes them together on the device of
+# --gpu_ids. Both end with uint8 CxHxW tensors on that device. Reports
+# images/sec and per batch latency percentiles, as JSON.
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+
+from benchmark_data import machine_info, percentiles
+from options.base_options import BaseOptions
+from data import batch_transform, jpeg_decoder
+from data.base_dataset import get_image_mode, to_uint8_tensor
+from data.image_folder import make_dataset, load_image
+
+
+def decode_pil(paths, mode, size, device):
+    return [to_uint8_tensor(load_image(path, mode, size)).to(device) for path in paths]
+
+
+def decode_torchvision(paths, mode, size, device):
+    return jpeg_decoder.decode_batch(jpeg_decoder.read_files(paths), mode, device)
+
+
+def run(decode, paths, batch_size, mode, size, device, num_batches, warmup):
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths) - batch_size + 1, batch_size)]
+    batches = batches[:warmup + num_batches]
+    times, images = [], 0
+    for i, batch in enumerate(batches):
+        start = time.perf_counter()
+        decode(batch, mode, size, device)
+        if device.type == 'cuda':
+            torch.cuda.synchronize(device)
+        if i >= warmup:
+            times.append(time.perf_counter() - start)
+            images += len(batch)
+    seconds = float(np.sum(times)) if times else 0.0
+    return {'images': images, 'seconds': seconds,
+            'images_per_sec': images / seconds if seconds > 0 else None,
+            'batch_latency_ms': percentiles(times)}
+
+
+def main():
+    options = BaseOptions()
+    options.initialize()
+    parser = options.parser
+    parser.add_argument('--folder', type=str, default='trainA', help='image folder under dataroot')
+    parser.add_argument('--batch_sizes', type=str, default='1,8,32', help='comma separated batch sizes to try')
+    parser.add_argument('--backends', type=str, default='pil,torchvision', help='comma separated decode backends')
+    parser.add_argument('--num_batches', type=int, default=20, help='# of measured batches per configuration')
+    parser.add_argument('--warmup', type=int, default=2, help='# of batches skipped before measuring')
+    parser.add_argument('--output', type=str, default='', help='write the JSON report here instead of stdout')
+    opt = parser.parse_args()
+    opt.gpu_ids = [int(i) for i in opt.gpu_ids.split(',') if int(i) >= 0]
+    device = batch_transform.get_device(opt)
+
+    paths = sorted(make_dataset(os.path.join(opt.dataroot, opt.folder)))
+    mode = get_image_mode(opt.input_nc)
+    # the stacked A images are decoded at (fineSize, fineSize * 2)
+    size = None if opt.no_draft else (opt.fineSize, opt.fineSize * 2)
+    decoders = {'pil': decode_pil, 'torchvision': decode_torchvision}
+
+    results = []
+    for backend in opt.backends.split(','):
+        if backend not in decoders:
+            raise ValueError('decode backend [%s] not recognized' % backend)
+        for batch_size in [int(b) for b in opt.batch_sizes.split(',')]:
+            config = {'backend': backend, 'batch_size': batch_size, 'device': str(device)}
+            print('benchmarking %s' % config, file=sys.stderr)
+            try:
+                if backend == 'torchvision':
+                    jpeg_decoder.check_backend()
+                config.update(run(decoders[backend], paths, batch_size, mode, size, device,
+                                  opt.num_batches, opt.warmup))
+            except (ValueError, OSError, RuntimeError) as e:
+                config['error'] = '%s: %s' % (type(e).__name__, e)
+            results.append(config)
+
+    report = json.dumps({'machine': machine_info(), 'folder': opt.folder, 'images': len(paths),
+                         'results': results}, indent=2)
+    if opt.output:
+        with open(opt.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
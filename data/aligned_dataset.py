@@ -2,43 +2,96 @@ import os.path
 import random
 import torchvision.transforms as transforms
 import torch
-from data.base_dataset import BaseDataset
+from data.base_dataset import BaseDataset, get_index_cache_dir, get_decoded_cache, get_image_loader, get_normalization, \
+    get_dataset_normalization, get_image_mode, get_tensor_transform, prescan_dir, array_to_tensor, to_uint8_tensor
+from data import batch_transform
 from data.image_folder import make_dataset
+from data.jpeg_decoder import read_files, decode_batch
+from data.readahead import unwrap
 from PIL import Image
 
 
 class AlignedDataset(BaseDataset):
+    decode_backends = ('pil', 'torchvision')
+
     def initialize(self, opt):
         self.opt = opt
         self.root = opt.dataroot
         self.dir_AB = os.path.join(opt.dataroot, opt.phase)
+        prescan_dir(opt, self.dir_AB)
 
-        self.AB_paths = sorted(make_dataset(self.dir_AB))
+        self.AB_paths = sorted(make_dataset(self.dir_AB, get_index_cache_dir(opt), dedup=opt.dedup))
 
         assert (opt.resize_or_crop == 'resize_and_crop')
 
-        transform_list = [transforms.ToTensor(),
-                          transforms.Normalize((0.5, 0.5, 0.5),
-                                               (0.5, 0.5, 0.5))]
-
-        self.transform = transforms.Compose(transform_list)
+        if opt.which_direction == 'BtoA':
+            input_nc, output_nc = opt.output_nc, opt.input_nc
+        else:
+            input_nc, output_nc = opt.input_nc, opt.output_nc
+        # AB is a single image, it is decoded as 'L' when both halves are 1
+        # channel, otherwise a 1 channel half is converted after the crop
+        self.mode = get_image_mode(max(input_nc, output_nc))
+        # A and B halves have their own (mean, std), they are normalized after
+        # the crop
+        self.normalization = get_dataset_normalization(opt, self.training_normalization)
+        self.norm_A, self.norm_B = self.normalization['A'], self.normalization['B']
+        self.transform_A = transforms.Compose(get_tensor_transform(opt, self.norm_A))
+        self.transform_B = transforms.Compose(get_tensor_transform(opt, self.norm_B))
+        self.load_size = None if opt.no_draft else (opt.loadSize * 2, opt.loadSize)
+        self.load_image, self.shm_cache = get_image_loader(opt, [self.load_size])
+
+        self.cache_AB = None
+        if opt.decoded_cache:
+            self.cache_AB = get_decoded_cache(opt, self.dir_AB, self.AB_paths,
+                                              (opt.loadSize * 2, opt.loadSize), self.mode)
+
+    def training_normalization(self):
+        norm_A, norm_B = get_normalization(self.opt, os.path.join(self.opt.dataroot, 'train'), 'horizontal',
+                                           self.mode)
+        return {'A': norm_A, 'B': norm_B}
 
     def __getitem__(self, index):
+        if isinstance(index, list):
+            return self.get_batch(index)
+        if not self.opt.batch_augment:
+            return self.get_crops(index, 1)[0]
+        index, open_file = unwrap(index)
         AB_path = self.AB_paths[index]
-        AB = Image.open(AB_path).convert('RGB')
-        AB = AB.resize((self.opt.loadSize * 2, self.opt.loadSize), Image.BICUBIC)
-        AB = self.transform(AB)
-
-        w_total = AB.size(2)
+        AB = self.cache_AB[index] if self.cache_AB is not None else self.load_image(open_file(AB_path), self.mode,
+                                                                                     self.load_size)
+        return {'AB': to_uint8_tensor(AB), 'A_paths': AB_path, 'B_paths': AB_path}
+
+    # count samples with independent crop windows and flips of one decoded AB
+    # image (--crops_per_decode)
+    def get_crops(self, index, count):
+        index, open_file = unwrap(index)
+        AB_path = self.AB_paths[index]
+        if self.cache_AB is not None:
+            AB = self.cache_AB[index]
+            w_total = AB.shape[1]
+            h = AB.shape[0]
+        else:
+            # the crop windows are drawn in (loadSize * 2, loadSize)
+            # coordinates first, only the two crops are resampled
+            AB = self.load_image(open_file(AB_path), self.mode, self.load_size)
+            w_total = self.opt.loadSize * 2
+            h = self.opt.loadSize
+        return [dict(self.crop(AB, w_total, h), A_paths=AB_path, B_paths=AB_path) for _ in range(count)]
+
+    def crop(self, AB, w_total, h):
         w = int(w_total / 2)
-        h = AB.size(1)
         w_offset = random.randint(0, max(0, w - self.opt.fineSize - 1))
         h_offset = random.randint(0, max(0, h - self.opt.fineSize - 1))
 
-        A = AB[:, h_offset:h_offset + self.opt.fineSize,
-            w_offset:w_offset + self.opt.fineSize]
-        B = AB[:, h_offset:h_offset + self.opt.fineSize,
-            w + w_offset:w + w_offset + self.opt.fineSize]
+        if self.cache_AB is not None:
+            # only the two crops are converted to float
+            A = array_to_tensor(self.opt, AB[h_offset:h_offset + self.opt.fineSize,
+                                             w_offset:w_offset + self.opt.fineSize], self.norm_A)
+            B = array_to_tensor(self.opt, AB[h_offset:h_offset + self.opt.fineSize,
+                                             w + w_offset:w + w_offset + self.opt.fineSize], self.norm_B)
+        else:
+            A = self.transform_A(self.resize_crop(AB, w_offset, h_offset))
+            B = self.transform_B(self.resize_crop(AB, w + w_offset, h_offset))
 
         if self.opt.which_direction == 'BtoA':
             input_nc = self.opt.output_nc
@@ -53,16 +106,64 @@ class AlignedDataset(BaseDataset):
             A = A.index_select(2, idx)
             B = B.index_select(2, idx)
 
-        if input_nc == 1:  # RGB to gray
+        if input_nc == 1 and A.size(0) == 3:  # RGB to gray
             tmp = A[0, ...] * 0.299 + A[1, ...] * 0.587 + A[2, ...] * 0.114
-            A = tmp.unsqueeze(0)
+            A = tmp.unsqueeze(0) if A.is_floating_point() else tmp.round().byte().unsqueeze(0)
 
-        if output_nc == 1:  # RGB to gray
+        if output_nc == 1 and B.size(0) == 3:  # RGB to gray
             tmp = B[0, ...] * 0.299 + B[1, ...] * 0.587 + B[2, ...] * 0.114
-            B = tmp.unsqueeze(0)
+            B = tmp.unsqueeze(0) if B.is_floating_point() else tmp.round().byte().unsqueeze(0)
+
+        return {'A': A, 'B': B}
+
+    # The fineSize crop at (x, y) of AB resized to (loadSize * 2, loadSize).
+    # Image.resize with a box in source coordinates uses the same filter
+    # support (pixels around the box included) as resizing the whole image,
+    # so the result matches the full resize followed by the crop.
+    def resize_crop(self, AB, x, y):
+        size = min(self.opt.fineSize, self.opt.loadSize)
+        sx = AB.size[0] / float(self.opt.loadSize * 2)
+        sy = AB.size[1] / float(self.opt.loadSize)
+        box = (x * sx, y * sy, (x + size) * sx, (y + size) * sy)
+        return AB.resize((size, size), Image.BICUBIC, box=box)
+
+    # --io_threads, see UnalignedDataset.sample_files
+    def sample_files(self, index):
+        return index, [self.AB_paths[index]]
+
+    # --decode_backend torchvision, see UnalignedDataset.get_batch
+    def get_batch(self, indices):
+        AB_paths = [self.AB_paths[index] for index in indices]
+        return {'AB': read_files(AB_paths), 'A_paths': AB_paths, 'B_paths': AB_paths}
+
+    def augment_batch(self, batch, device):
+        fine = self.opt.fineSize
+        AB = batch['AB']
+        if self.opt.decode_backend == 'torchvision':
+            AB = decode_batch(AB, self.mode, device)
+        AB = batch_transform.to_device(AB, device)
+        AB = batch_transform.resize(AB, (self.opt.loadSize, self.opt.loadSize * 2))
+        n, h, w = AB.size(0), AB.size(2), AB.size(3) // 2
+        # same crop window in both halves, same margin as __getitem__
+        h_offset, w_offset = batch_transform.random_offsets(n, h, w, fine, margin=1)
+        A = batch_transform.crop(AB, fine, h_offset, w_offset)
+        B = batch_transform.crop(AB, fine, h_offset, w_offset + w)
+        if not self.opt.no_flip:
+            mask = torch.rand(n) < 0.5
+            A = batch_transform.flip(A, mask)
+            B = batch_transform.flip(B, mask)
+        A = batch_transform.normalize(A, self.norm_A)
+        B = batch_transform.normalize(B, self.norm_B)
 
-        return {'A': A, 'B': B,
-                'A_paths': AB_path, 'B_paths': AB_path}
+        if self.opt.which_direction == 'BtoA':
+            input_nc, output_nc = self.opt.output_nc, self.opt.input_nc
+        else:
+            input_nc, output_nc = self.opt.input_nc, self.opt.output_nc
+        if input_nc == 1 and A.size(1) == 3:  # RGB to gray
+            A = batch_transform.to_gray(A)
+        if output_nc == 1 and B.size(1) == 3:  # RGB to gray
+            B = batch_transform.to_gray(B)
+        return {'A': A, 'B': B, 'A_paths': batch['A_paths'], 'B_paths': batch['B_paths']}
 
     def __len__(self):
         return len(self.AB_paths)
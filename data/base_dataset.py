@@ -1,3 +1,9 @@
+import hashlib
+import json
+import os.path
+import random
+import numpy as np
+import torch
 import torch.utils.data as data
 from PIL import Image
 import torchvision.transforms as transforms
@@ -14,29 +20,74 @@ class BaseDataset(data.Dataset):
         pass
 
 
-def get_transform(opt):
+# (mean, std) used by Normalize unless --normalize dataset
+FIXED_NORMALIZATION = ((0.5, 0.5, 0.5), (0.5, 0.5, 0.5))
+
+
+def fixed_normalization(channels):
+    return ((0.5,) * channels, (0.5,) * channels)
+
+
+def is_fixed_normalization(normalization):
+    return all(v == 0.5 for values in normalization for v in values)
+
+
+# --normalize dataset centers every channel on its mean and divides by
+# STD_RANGE * std, values are then clamped, so that real images stay in the
+# [-1, 1] range of the tanh generators
+STD_RANGE = 2.0
+
+
+# PIL mode a modality with nc channels is decoded in, single channel
+# (thermal) modalities stay 1 channel from the decoder to the networks
+def get_image_mode(nc):
+    return 'L' if nc == 1 else 'RGB'
+
+
+def get_transform(opt, normalization=FIXED_NORMALIZATION):
+    return transforms.Compose(get_resize_transform(opt) + get_crop_transform(opt, normalization))
+
+
+# Deterministic part of get_transform, done once per decoded image
+def get_resize_transform(opt):
     transform_list = []
     if opt.resize_or_crop == 'resize_and_crop':
         osize = [opt.loadSize, opt.loadSize]
         transform_list.append(transforms.Scale(osize, Image.BICUBIC))
-        transform_list.append(transforms.RandomCrop(opt.fineSize))
-    elif opt.resize_or_crop == 'crop':
-        transform_list.append(transforms.RandomCrop(opt.fineSize))
     elif opt.resize_or_crop == 'scale_width':
         transform_list.append(transforms.Lambda(
             lambda img: __scale_width(img, opt.fineSize)))
     elif opt.resize_or_crop == 'scale_width_and_crop':
         transform_list.append(transforms.Lambda(
             lambda img: __scale_width(img, opt.loadSize)))
+    # 'none' keeps the original resolution
+    return transform_list
+
+
+# Random part of get_transform, done once per sample (--crops_per_decode
+# draws several from one resized image)
+def get_crop_transform(opt, normalization=FIXED_NORMALIZATION):
+    transform_list = []
+    if opt.resize_or_crop in ('resize_and_crop', 'crop', 'scale_width_and_crop'):
         transform_list.append(transforms.RandomCrop(opt.fineSize))
 
     if opt.isTrain and not opt.no_flip:
         transform_list.append(transforms.RandomHorizontalFlip())
 
-    transform_list += [transforms.ToTensor(),
-                       transforms.Normalize((0.5, 0.5, 0.5),
-                                            (0.5, 0.5, 0.5))]
-    return transforms.Compose(transform_list)
+    transform_list += get_tensor_transform(opt, normalization)
+    return transform_list
+
+
+# ToTensor() and Normalize, or with --uint8_transport only the CxHxW uint8
+# tensor: the loader workers send 4x fewer bytes and the models convert and
+# normalize the whole batch in set_input (BaseModel.assign_input)
+def get_tensor_transform(opt, normalization):
+    if opt.uint8_transport:
+        return [transforms.Lambda(to_uint8_tensor)]
+    transform_list = [transforms.ToTensor(), transforms.Normalize(*normalization)]
+    if not is_fixed_normalization(normalization):
+        transform_list.append(transforms.Lambda(lambda x: x.clamp_(-1.0, 1.0)))
+    return transform_list
 
 
 def __scale_width(img, target_width):
@@ -46,3 +97,173 @@ def __scale_width(img, target_width):
     w = target_width
     h = int(target_width * oh / ow)
     return img.resize((w, h), Image.BICUBIC)
+
+
+def get_cache_dir(opt):
+    if opt.cache_dir:
+        return opt.cache_dir
+    return os.path.join(opt.dataroot, '.cache')
+
+
+# where make_dataset keeps its persistent file index, None to always walk
+def get_index_cache_dir(opt):
+    if opt.no_index_cache:
+        return None
+    return get_cache_dir(opt)
+
+
+# image folders read by the folder based dataset modes
+def get_dataset_dirs(opt):
+    if opt.dataset_mode == 'aligned':
+        return [os.path.join(opt.dataroot, opt.phase)]
+    elif opt.dataset_mode == 'single':
+        return [opt.dataroot]
+    elif opt.dataset_mode == 'unaligned':
+        dir_A = opt.phase + 'A'
+        if opt.A_layout == 'split':
+            dir_A += '_' + ('visible' if opt.no_input == 1 else 'lwir')
+        return [os.path.join(opt.dataroot, dir_A), os.path.join(opt.dataroot, opt.phase + 'B')]
+    raise ValueError('dataset_mode [%s] does not read image folders' % opt.dataset_mode)
+
+
+# With --prescan, checks the images of dir before the dataset lists it;
+# broken ones are quarantined and left out by make_dataset.
+def prescan_dir(opt, dir):
+    if opt.prescan:
+        from data.prescan import prescan
+        prescan(dir, get_cache_dir(opt), num_workers=max(1, int(opt.nThreads)))
+
+
+# the cache of the images of dir is named after the folder and a hash of its
+# absolute path, so datasets sharing --cache_dir do not overwrite each other
+def get_decoded_cache(opt, dir, paths, size, mode='RGB'):
+    from data.decoded_cache import DecodedCache
+    if opt.resize_or_crop != 'resize_and_crop':
+        raise ValueError('--decoded_cache only supports resize_or_crop [resize_and_crop], got [%s]'
+                         % opt.resize_or_crop)
+    abs_dir = os.path.abspath(dir)
+    name = '%s_%s' % (os.path.basename(abs_dir), hashlib.sha1(abs_dir.encode('utf-8')).hexdigest()[:16])
+    cache = DecodedCache(get_cache_dir(opt), name, paths, size, draft=not opt.no_draft, mode=mode)
+    return cache.prepare(num_workers=max(1, int(opt.nThreads)))
+
+
+# image_folder.load_image, or the load_image of a cache shared by the loader
+# workers with --shm_cache, load_sizes are the draft sizes the dataset uses
+def get_image_loader(opt, load_sizes):
+    from data.image_folder import load_image
+    if opt.shm_cache <= 0:
+        return load_image, None
+    from data.shm_cache import SharedImageCache, slot_bytes
+    cache = SharedImageCache(opt.shm_cache << 20, max(slot_bytes(size) for size in load_sizes))
+    return cache.load_image, cache
+
+
+# (mean, std) of every modality stored in the images of dir, see
+# data.statistics.split_image for split. The fixed (0.5, 0.5) unless
+# --normalize dataset, which uses the cached statistics of the folder, with
+# std scaled by STD_RANGE. The datasets pass the training folders.
+def get_normalization(opt, dir, split=None, mode='RGB'):
+    count = 1 if split is None else 2
+    if opt.normalize == 'fixed':
+        return [fixed_normalization(1 if mode == 'L' else 3)] * count
+    elif opt.normalize != 'dataset':
+        raise ValueError('--normalize [%s] not recognized' % opt.normalize)
+    from data.image_folder import make_dataset
+    from data.statistics import get_stats
+    paths = sorted(make_dataset(dir, get_index_cache_dir(opt)))
+    name = os.path.basename(os.path.normpath(dir))
+    stats = get_stats(get_cache_dir(opt), name, paths, split, num_workers=max(1, int(opt.nThreads)), mode=mode)
+    if len(stats['modalities']) != count:
+        raise ValueError('no statistics for [%s], is the folder empty?' % dir)
+    # constant channels would divide by zero
+    return [(tuple(m['mean']), tuple(STD_RANGE * max(s, 1.0 / 255) for s in m['std'])) for m in stats['modalities']]
+
+
+# With --normalize dataset, the {'A': (mean, std), 'B': (mean, std)} the
+# model is trained with are written to [checkpoints_dir]/[name]/NORMALIZATION
+# by the training run and read back at test time, so that test data is
+# normalized like the training data and the training folders are not needed.
+# compute() gets them from the training folders (get_normalization).
+NORMALIZATION = 'normalization.json'
+
+
+def get_dataset_normalization(opt, compute):
+    if opt.normalize == 'fixed':
+        return compute()
+    path = os.path.join(opt.checkpoints_dir, opt.name, NORMALIZATION)
+    if opt.isTrain:
+        normalization = compute()
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path + '.tmp', 'w') as f:
+            json.dump(normalization, f, indent=1, sort_keys=True)
+        os.replace(path + '.tmp', path)
+        return normalization
+    if not os.path.isfile(path):
+        raise ValueError('--normalize dataset: %s not found, it is written by the training run' % path)
+    with open(path) as f:
+        return dict((key, (tuple(mean), tuple(std))) for key, (mean, std) in json.load(f).items())
+
+
+# Smallest (width, height) that get_transform still needs from the decoded
+# image, used as JPEG draft size. None when the full image is needed.
+def get_load_size(opt):
+    if opt.no_draft:
+        return None
+    if opt.resize_or_crop == 'resize_and_crop':
+        return (opt.loadSize, opt.loadSize)
+    elif opt.resize_or_crop == 'scale_width':
+        return (opt.fineSize, 1)
+    elif opt.resize_or_crop == 'scale_width_and_crop':
+        return (opt.loadSize, 1)
+    return None
+
+
+# (height, width) of an image of the given (width, height) after get_transform
+def get_output_size(opt, size):
+    w, h = size
+    if opt.resize_or_crop in ('resize_and_crop', 'crop', 'scale_width_and_crop'):
+        return (opt.fineSize, opt.fineSize)
+    elif opt.resize_or_crop == 'scale_width':
+        return (int(opt.fineSize * h / w), opt.fineSize)
+    return (h, w)
+
+
+# Random part of get_transform applied to an already resized HxWxC uint8
+# array, as stored in the decoded cache.
+def random_crop_flip(img, opt):
+    h, w = img.shape[:2]
+    th, tw = min(opt.fineSize, h), min(opt.fineSize, w)
+    i = random.randint(0, h - th)
+    j = random.randint(0, w - tw)
+    img = img[i:i + th, j:j + tw]
+    if opt.isTrain and not opt.no_flip and random.random() < 0.5:
+        img = img[:, ::-1]
+    return img
+
+
+# Same as ToTensor() followed by Normalize(*normalization)
+def uint8_to_tensor(img, normalization=FIXED_NORMALIZATION):
+    img = torch.from_numpy(np.ascontiguousarray(img).copy())
+    img = img.permute(2, 0, 1).float()
+    if is_fixed_normalization(normalization):
+        return img.div_(127.5).sub_(1.0)
+    mean, std = [torch.tensor(v).view(-1, 1, 1) * 255.0 for v in normalization]
+    return img.sub_(mean).div_(std).clamp_(-1.0, 1.0)
+
+
+# Decoded HxWxC uint8 array (decoded cache) as the tensor the datasets
+# return, see get_tensor_transform
+def array_to_tensor(opt, img, normalization):
+    if opt.uint8_transport:
+        return to_uint8_tensor(img)
+    return uint8_to_tensor(img, normalization)
+
+
+# Decoded image (PIL or HxWxC array) as a CxHxW uint8 tensor, used by
+# --batch_augment. Always copies, so the read-only decoded cache is fine too.
+def to_uint8_tensor(img):
+    img = np.array(img, dtype=np.uint8)
+    if img.ndim == 2:
+        img = img[:, :, None]
+    return torch.from_numpy(img).permute(2, 0, 1)
@@ -0,0 +1,112 @@
+import torch
+import torch.nn.functional as F
+from torch.utils.data.dataloader import default_collate
+from data.base_dataset import FIXED_NORMALIZATION, is_fixed_normalization
+
+
+# Batched, on-device counterpart of base_dataset.get_transform. With
+# --batch_augment the datasets return decoded uint8 CxHxW tensors and the
+# resize/crop/flip/normalize below run once per collated batch, with
+# random parameters drawn per sample.
+
+
+def get_device(opt):
+    if len(opt.gpu_ids) > 0:
+        return torch.device('cuda', opt.gpu_ids[0])
+    return torch.device('cpu')
+
+
+# Stacks images when they all have the same size and keeps a list otherwise,
+# resize() brings lists to a common size on the device.
+def collate_batch(samples):
+    batch = {}
+    for key in samples[0]:
+        values = [sample[key] for sample in samples]
+        if torch.is_tensor(values[0]) and any(v.shape != values[0].shape for v in values):
+            batch[key] = values
+        else:
+            batch[key] = default_collate(values)
+    return batch
+
+
+def to_device(images, device):
+    if isinstance(images, (list, tuple)):
+        return [img.to(device, non_blocking=True) for img in images]
+    return images.to(device, non_blocking=True)
+
+
+def _interpolate(x, size):
+    try:
+        return F.interpolate(x, size=size, mode='bicubic', align_corners=False, antialias=True)
+    except TypeError:  # antialias needs torch >= 1.11
+        return F.interpolate(x, size=size, mode='bicubic', align_corners=False)
+
+
+# size is (height, width); returns a float [N, C, h, w] batch in [0, 255]
+def resize(images, size):
+    if isinstance(images, (list, tuple)):
+        return torch.cat([resize(img.unsqueeze(0), size) for img in images], 0)
+    x = images.float()
+    if tuple(x.shape[-2:]) != tuple(size):
+        x = _interpolate(x, size).clamp_(0, 255)
+    return x
+
+
+def random_offsets(n, h, w, size, margin=0):
+    i = torch.randint(0, max(0, h - size - margin) + 1, (n,))
+    j = torch.randint(0, max(0, w - size - margin) + 1, (n,))
+    return i, j
+
+
+# gathers an independent size x size crop per sample
+def crop(x, size, i, j):
+    n, c = x.size(0), x.size(1)
+    size = min(size, x.size(2), x.size(3))
+    ar = torch.arange(size, device=x.device)
+    rows = (i.to(x.device).view(n, 1) + ar).view(n, 1, size, 1)
+    cols = (j.to(x.device).view(n, 1) + ar).view(n, 1, 1, size)
+    batch = torch.arange(n, device=x.device).view(n, 1, 1, 1)
+    channels = torch.arange(c, device=x.device).view(1, c, 1, 1)
+    return x[batch, channels, rows, cols]
+
+
+def random_flip_mask(n, opt):
+    if opt.isTrain and not opt.no_flip:
+        return torch.rand(n) < 0.5
+    return torch.zeros(n, dtype=torch.bool)
+
+
+def flip(x, mask):
+    mask = mask.to(x.device).view(-1, 1, 1, 1)
+    return torch.where(mask, x.flip(3), x)
+
+
+# normalization: (mean, std) on the [0, 1] scale, as for Normalize
+def normalize(x, normalization=FIXED_NORMALIZATION):
+    if is_fixed_normalization(normalization):
+        return x.div_(127.5).sub_(1.0)
+    # channels are the third dimension from the end, for [N, M, C, H, W] too
+    mean, std = [x.new_tensor(v).view(-1, 1, 1) * 255.0 for v in normalization]
+    return x.sub_(mean).div_(std).clamp_(-1.0, 1.0)
+
+
+def to_gray(x):
+    return (x[:, 0:1] * 0.299 + x[:, 1:2] * 0.587 + x[:, 2:3] * 0.114)
+
+
+# batched get_transform(opt)
+def augment(images, opt, device, normalization=FIXED_NORMALIZATION):
+    x = to_device(images, device)
+    if opt.resize_or_crop == 'resize_and_crop':
+        x = resize(x, (opt.loadSize, opt.loadSize))
+    elif opt.resize_or_crop == 'crop':
+        if isinstance(x, list):
+            return torch.cat([augment(img.unsqueeze(0), opt, device, normalization) for img in x], 0)
+        x = x.float()
+    else:
+        raise ValueError('--batch_augment only supports resize_or_crop [resize_and_crop | crop], got [%s]'
+                         % opt.resize_or_crop)
+    i, j = random_offsets(x.size(0), x.size(2), x.size(3), opt.fineSize)
+    x = crop(x, opt.fineSize, i, j)
+    x = flip(x, random_flip_mask(x.size(0), opt))
+    return normalize(x, normalization)
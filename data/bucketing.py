@@ -0,0 +1,57 @@
+import collections
+import torch
+import torch.nn.functional as F
+from torch.utils.data.dataloader import default_collate
+
+
+# Test-time batching of variable resolution inputs. Images are grouped by
+# their size padded up to a multiple of the generator downsampling factor,
+# every batch only holds images of one bucket, and pad_collate pads them to
+# the bucket size. The original (height, width) of every image is kept in
+# batch['sizes'] so that the outputs can be cropped back.
+
+
+def padded_size(size, multiple):
+    h, w = size
+    return ((h + multiple - 1) // multiple * multiple, (w + multiple - 1) // multiple * multiple)
+
+
+class BucketBatchSampler(object):
+    def __init__(self, indices, sizes, batch_size, multiple):
+        # sizes: (height, width) of every sample after its transform
+        self.batch_size = batch_size
+        buckets = collections.OrderedDict()
+        for index, size in zip(indices, sizes):
+            buckets.setdefault(padded_size(size, multiple), []).append(index)
+        self.batches = []
+        for indices in buckets.values():
+            for start in range(0, len(indices), batch_size):
+                self.batches.append(indices[start:start + batch_size])
+
+    def __iter__(self):
+        return iter(self.batches)
+
+    def __len__(self):
+        return len(self.batches)
+
+
+class PadCollate(object):
+    def __init__(self, key, multiple):
+        self.key = key
+        self.multiple = multiple
+
+    def __call__(self, samples):
+        images = [sample.pop(self.key) for sample in samples]
+        batch = default_collate(samples)
+        sizes = [tuple(img.shape[-2:]) for img in images]
+        h, w = padded_size((max(s[0] for s in sizes), max(s[1] for s in sizes)), self.multiple)
+        padded = []
+        for img in images:
+            pad = (0, w - img.size(-1), 0, h - img.size(-2))
+            if pad[1] or pad[3]:
+                # replicate padding is only implemented for float tensors
+                img = F.pad(img.unsqueeze(0).float(), pad, mode='replicate').squeeze(0).to(img.dtype)
+            padded.append(img)
+        batch[self.key] = torch.stack(padded, 0)
+        batch['sizes'] = sizes
+        return batch
@@ -1,5 +1,16 @@
+import inspect
+import itertools
+import random
 import torch.utils.data
+from torch.utils.data.dataloader import default_collate
 from data.base_data_loader import BaseDataLoader
+from data import batch_transform, jpeg_decoder
+from data.prefetcher import BatchFeeder
+from data.samplers import PairingSampler, LossAwareSampler
+from data.bucketing import BucketBatchSampler, PadCollate
+from data.readahead import ReadaheadSampler
+from data.echo import DataEcho
+from data.shards import shuffle_buffer
 
 
 def CreateDataset(opt):
@@ -13,6 +24,12 @@ def CreateDataset(opt):
     elif opt.dataset_mode == 'single':
         from data.single_dataset import SingleDataset
         dataset = SingleDataset()
+    elif opt.dataset_mode == 'sharded':
+        from data.sharded_dataset import ShardedDataset
+        dataset = ShardedDataset()
+    elif opt.dataset_mode == 'kaist':
+        from data.kaist_dataset import KaistDataset
+        dataset = KaistDataset()
     else:
         raise ValueError("Dataset [%s] not recognized." % opt.dataset_mode)
 
@@ -21,6 +38,19 @@ def CreateDataset(opt):
     return dataset
 
 
+# Dataset item of --crops_per_decode: the list of crops of one decoded sample
+class MultiCropDataset(torch.utils.data.Dataset):
+    def __init__(self, dataset, count):
+        self.dataset = dataset
+        self.count = count
+
+    def __getitem__(self, index):
+        return self.dataset.get_crops(index, self.count)
+
+    def __len__(self):
+        return len(self.dataset)
+
+
 class CustomDatasetDataLoader(BaseDataLoader):
     def name(self):
         return 'CustomDatasetDataLoader'
@@ -28,14 +58,182 @@ class CustomDatasetDataLoader(BaseDataLoader):
     def initialize(self, opt):
         BaseDataLoader.initialize(self, opt)
         self.dataset = CreateDataset(opt)
+        # iterable datasets shuffle on their own
+        shuffle = not opt.serial_batches and not isinstance(self.dataset, torch.utils.data.IterableDataset)
+        collate_fn = None
+        self.device = batch_transform.get_device(opt)
+        if opt.batch_augment:
+            if not hasattr(self.dataset, 'augment_batch'):
+                raise ValueError('--batch_augment is not supported by dataset [%s]' % self.dataset.name())
+            collate_fn = batch_transform.collate_batch
+        kwargs = {'batch_size': opt.batchSize, 'shuffle': shuffle}
+        self.sampler = None
+        if getattr(opt, 'loss_sampling', False):
+            if not hasattr(self.dataset, 'B_size') or isinstance(self.dataset, torch.utils.data.IterableDataset):
+                raise ValueError('--loss_sampling is not supported by dataset [%s]' % self.dataset.name())
+            # the losses seen by one process would give every rank a different distribution
+            if opt.world_size > 1:
+                raise ValueError('--loss_sampling does not support world_size > 1')
+            self.sampler = LossAwareSampler(self.dataset.A_size, self.dataset.B_size, len(self.dataset),
+                                            seed=opt.seed if opt.seed >= 0 else random.getrandbits(31),
+                                            temperature=opt.loss_temperature, floor=opt.loss_floor)
+            kwargs['sampler'] = self.sampler
+            kwargs['shuffle'] = False
+        elif opt.seed >= 0:
+            if not hasattr(self.dataset, 'B_size') or isinstance(self.dataset, torch.utils.data.IterableDataset):
+                raise ValueError('--seed is not supported by dataset [%s]' % self.dataset.name())
+            self.sampler = PairingSampler(self.dataset.A_size, self.dataset.B_size, len(self.dataset),
+                                          seed=opt.seed, shuffle=shuffle, rank=opt.rank, world_size=opt.world_size)
+            kwargs['sampler'] = self.sampler
+            kwargs['shuffle'] = False
+        if getattr(opt, 'bucketed', False):
+            if not hasattr(self.dataset, 'bucket_sizes') or opt.batch_augment:
+                raise ValueError('--bucketed is not supported by dataset [%s]' % self.dataset.name())
+            indices, sizes = self.dataset.bucket_sizes()
+            self.sampler = BucketBatchSampler(indices, sizes, opt.batchSize, opt.bucket_multiple)
+            kwargs = {'batch_sampler': self.sampler}
+            collate_fn = PadCollate(self.dataset.bucket_key, opt.bucket_multiple)
+        if opt.decode_backend != 'pil':
+            if opt.decode_backend not in getattr(self.dataset, 'decode_backends', ('pil',)):
+                raise ValueError('--decode_backend %s is not supported by dataset [%s]' %
+                                 (opt.decode_backend, self.dataset.name()))
+            if not opt.batch_augment or opt.decoded_cache or getattr(opt, 'bucketed', False):
+                raise ValueError('--decode_backend %s needs --batch_augment, without --decoded_cache or --bucketed' %
+                                 opt.decode_backend)
+            jpeg_decoder.check_backend()
+            # the dataset is called once per batch with the list of its indices
+            kwargs = {'sampler': torch.utils.data.BatchSampler(self._index_sampler(kwargs), opt.batchSize,
+                                                               drop_last=False),
+                      'batch_size': None}
+            collate_fn = None
+        if opt.io_threads > 0:
+            if not hasattr(self.dataset, 'sample_files') or getattr(opt, 'bucketed', False):
+                raise ValueError('--io_threads is not supported by dataset [%s]' % self.dataset.name())
+            # cached images would be read anyway
+            if opt.decoded_cache or opt.shm_cache > 0 or opt.decode_backend != 'pil':
+                raise ValueError('--io_threads does not combine with --decoded_cache, --shm_cache or --decode_backend')
+            kwargs['sampler'] = ReadaheadSampler(self._index_sampler(kwargs), self.dataset, opt.readahead,
+                                                 opt.io_threads)
+            kwargs['shuffle'] = False
+        # --crops_per_decode: every dataset item is a list of crops, they are
+        # mixed and collated in __iter__
+        self.crops = getattr(opt, 'crops_per_decode', 1)
+        dataset = self.dataset
+        if self.crops > 1:
+            if not hasattr(self.dataset, 'get_crops') or opt.batch_augment or opt.decode_backend != 'pil':
+                raise ValueError('--crops_per_decode is not supported by dataset [%s], nor with --batch_augment '
+                                 'or --decode_backend' % self.dataset.name())
+            dataset = MultiCropDataset(self.dataset, self.crops)
+            kwargs['batch_size'] = None
+        self.feeder = None
+        if opt.prefetch > 0:
+            self.feeder = BatchFeeder(self.device, opt.prefetch)
+            kwargs['pin_memory'] = self.device.type == 'cuda'
+            # workers that outlive the epoch would not see set_epoch()
+            if (int(opt.nThreads) > 0 and not hasattr(self.dataset, 'set_epoch') and
+                    'persistent_workers' in inspect.signature(torch.utils.data.DataLoader).parameters):
+                kwargs['persistent_workers'] = True
+        self.echo = None
+        if getattr(opt, 'echo', 1) > 1:
+            self.echo = DataEcho(opt, opt.echo, opt.echo_shift)
         self.dataloader = torch.utils.data.DataLoader(
-            self.dataset,
-            batch_size=opt.batchSize,
-            shuffle=not opt.serial_batches,
-            num_workers=int(opt.nThreads))
+            dataset,
+            num_workers=int(opt.nThreads),
+            collate_fn=collate_fn,
+            **kwargs)
+        self.epoch = getattr(opt, 'epoch_count', 1)
+        self.resume_iter = getattr(opt, 'resume_iter', 0)
+
+    # indices the DataLoader would draw from with these arguments
+    def _index_sampler(self, kwargs):
+        if kwargs.get('sampler') is not None:
+            return kwargs['sampler']
+        if kwargs['shuffle']:
+            return torch.utils.data.RandomSampler(self.dataset)
+        return torch.utils.data.SequentialSampler(self.dataset)
 
     def load_data(self):
-        return self.dataloader
+        return self
+
+    def __iter__(self):
+        # lets epoch dependent datasets reshuffle before the workers start
+        if hasattr(self.dataset, 'set_epoch'):
+            self.dataset.set_epoch(self.epoch)
+        if isinstance(self.sampler, PairingSampler):
+            # only the first epoch of a resumed run is fast-forwarded
+            self.sampler.set_epoch(self.epoch, self.resume_iter // self.crops)
+            self.resume_iter = 0
+        self.epoch += 1
+        batches = iter(self.dataloader)
+        if self.crops > 1:
+            batches = self._mixed(batches)
+        if self.feeder is not None:
+            batches = self.feeder.feed(batches)
+        if self.opt.batch_augment:
+            batches = self._augmented(batches)
+        batches = self._with_normalization(batches)
+        if self.echo is not None:
+            batches = self.echo.feed(batches)
+        return batches
+
+    # The crops of every decoded image go through a bounded shuffle buffer
+    # before they are collated. An epoch keeps len(self) samples, i.e. about
+    # 1 / crops of the images are decoded.
+    def _mixed(self, crops):
+        samples = (sample for group in crops for sample in group)
+        samples = itertools.islice(shuffle_buffer(samples, self.opt.crop_buffer, random), len(self))
+        while True:
+            batch = list(itertools.islice(samples, self.opt.batchSize))
+            if not batch:
+                return
+            yield default_collate(batch)
+
+    # batches carry the (mean, std) of their images: uint8 batches are
+    # normalized with it in set_input, and the visuals are denormalized with
+    # it. A missing key means the fixed 0.5/0.5
+    def _with_normalization(self, batches):
+        normalization = getattr(self.dataset, 'normalization', {})
+        for batch in batches:
+            batch['normalization'] = normalization
+            yield batch
+
+    def _augmented(self, batches):
+        for batch in batches:
+            # not yielded inside no_grad, the trainer would run without grad
+            with torch.no_grad():
+                batch = self.dataset.augment_batch(batch, self.device)
+            yield batch
+
+    # per sample losses of the last step (model.get_sample_losses()) for
+    # --loss_sampling, ignored otherwise
+    def record_losses(self, data, losses):
+        if isinstance(self.sampler, LossAwareSampler) and losses is not None:
+            self.sampler.record(data['A_index'], losses)
+
+    # hit/miss counters of the --shm_cache, None without it
+    def shm_cache_stats(self):
+        cache = getattr(self.dataset, 'shm_cache', None)
+        return None if cache is None else cache.stats()
+
+    # average # of steps per loaded batch since the last call, None without
+    # --echo
+    def echo_factor(self):
+        if self.echo is None:
+            return None
+        factor = self.echo.average_factor()
+        self.echo.reset_stats()
+        return factor
+
+    # ms per step the trainer waited for data since the last call, None
+    # without --prefetch
+    def data_wait_ms(self):
+        if self.feeder is None:
+            return None
+        wait_ms = self.feeder.wait_ms()
+        self.feeder.reset_stats()
+        return wait_ms
 
     def __len__(self):
+        if isinstance(self.sampler, PairingSampler):
+            return min(self.sampler.num_samples, self.opt.max_dataset_size)
         return min(len(self.dataset), self.opt.max_dataset_size)
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+from data.image_folder import load_image
+
+
+# Memory-mapped store for the deterministic part of the input pipeline.
+# Every image of a split is decoded and resized once into a single
+# <name>.u8 file of shape (N, H, W, 3), (N, H, W, 1) for mode 'L'; <name>.json holds the index (the
+# ordered list of source paths) and a manifest with size, mtime and sha1 of
+# every source file, so that an edited, added or removed image invalidates
+# the cache. Random crop/flip is still done per sample by the datasets.
+
+CACHE_VERSION = 1
+
+
+def file_digest(path, block_size=1 << 20):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _decode_and_resize(args):
+    path, size, draft, mode = args
+    img = load_image(path, mode, size if draft else None)
+    if img.size != size:
+        img = img.resize(size, Image.BICUBIC)
+    st = os.stat(path)
+    img = np.asarray(img, dtype=np.uint8)
+    if img.ndim == 2:
+        img = img[:, :, None]
+    return img, [path, st.st_size, st.st_mtime_ns, file_digest(path)]
+
+
+class DecodedCache():
+    def __init__(self, cache_dir, name, paths, size, draft=True, mode='RGB'):
+        # size is (width, height), as in PIL
+        self.cache_dir = cache_dir
+        suffix = '_L' if mode == 'L' else ''
+        self.data_path = os.path.join(cache_dir, '%s_%dx%d%s.u8' % (name, size[0], size[1], suffix))
+        self.index_path = os.path.splitext(self.data_path)[0] + '.json'
+        self.paths = list(paths)
+        self.size = tuple(size)
+        self.mode = mode
+        self.shape = (len(self.paths), self.size[1], self.size[0], 1 if mode == 'L' else 3)
+        self.draft = draft
+        self._array = None
+
+    def name(self):
+        return 'DecodedCache'
+
+    def is_valid(self):
+        if not (os.path.isfile(self.data_path) and os.path.isfile(self.index_path)):
+            return False
+        with open(self.index_path) as f:
+            index = json.load(f)
+        if index.get('version') != CACHE_VERSION or tuple(index['size']) != self.size:
+            return False
+        files = index['files']
+        if [entry[0] for entry in files] != self.paths:
+            return False
+        if os.path.getsize(self.data_path) != int(np.prod(self.shape)):
+            return False
+        changed = False
+        for entry in files:
+            path, st_size, mtime_ns, digest = entry
+            st = os.stat(path)
+            if st.st_size == st_size and st.st_mtime_ns == mtime_ns:
+                continue
+            # touched but maybe not modified: fall back to the content hash
+            if st.st_size != st_size or file_digest(path) != digest:
+                return False
+            entry[1], entry[2] = st.st_size, st.st_mtime_ns
+            changed = True
+        if changed:
+            self._write_index(files)
+        return True
+
+    def materialize(self, num_workers=1):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        print('materializing %d images into %s' % (len(self.paths), self.data_path))
+        tmp_path = self.data_path + '.tmp'
+        out = np.memmap(tmp_path, dtype=np.uint8, mode='w+', shape=self.shape)
+        files = []
+        jobs = [(path, self.size, self.draft, self.mode) for path in self.paths]
+        pool = Pool(num_workers) if num_workers > 1 else None
+        results = pool.imap(_decode_and_resize, jobs, chunksize=16) if pool else map(_decode_and_resize, jobs)
+        for i, (img, entry) in enumerate(results):
+            out[i] = img
+            files.append(entry)
+            if (i + 1) % 1000 == 0:
+                print('    materialized: %d/%d' % (i + 1, len(jobs)))
+        if pool:
+            pool.close()
+            pool.join()
+        out.flush()
+        del out
+        os.replace(tmp_path, self.data_path)
+        self._write_index(files)
+        self._array = None
+
+    def _write_index(self, files):
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'size': list(self.size), 'files': files}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def prepare(self, num_workers=1):
+        if not self.is_valid():
+            self.materialize(num_workers)
+        return self
+
+    def __getitem__(self, index):
+        # opened lazily so that every DataLoader worker maps the file itself
+        # instead of receiving a pickled copy of the whole array
+        if self._array is None:
+            self._array = np.memmap(self.data_path, dtype=np.uint8, mode='r', shape=self.shape)
+        return self._array[index]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_array'] = None
+        return state
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+from data.image_folder import make_dataset, load_image, DEDUP
+
+
+# Near-duplicate frames of the KAIST-derived folders (consecutive frames of
+# 20 fps sequences). Every image gets a 64 bit difference hash (dHash: the
+# signs of the horizontal gradients of a 9x8 grayscale thumbnail), computed
+# by a process pool and cached in <cache_dir>/dhash_<hash of dir>.json with
+# the size and mtime of every file. Hashes within `radius` bits of each other
+# are near-duplicates; they are searched with multi-index hashing: the 64
+# bits are cut into radius + 1 substrings, two hashes within radius bits
+# agree exactly on at least one of them, so only the hashes sharing a
+# substring with the query are compared.
+#
+# Folders are clustered in file name order (frame order) around
+# representatives: an image joins the closest representative within radius,
+# otherwise it becomes one. Every member is within radius of its
+# representative, so slowly drifting sequences are not chained into one
+# cluster. The representatives are written to [dir]/dedup.json, which
+# make_dataset(dedup=True) (--dedup) honours.
+
+DEDUP_VERSION = 1
+HASH_BITS = 64
+
+
+def dhash(path):
+    # draft decoding, only a thumbnail is needed
+    img = load_image(path, 'L', (64, 64)).resize((9, 8), Image.BILINEAR)
+    pixels = np.asarray(img, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).reshape(-1)
+    return int(sum(1 << i for i, bit in enumerate(bits) if bit))
+
+
+def _hash(path):
+    st = os.stat(path)
+    try:
+        h = dhash(path)
+    except Exception:  # broken files are left to data.prescan
+        h = None
+    return path, [st.st_size, st.st_mtime_ns, h]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+# {path: hash} of every image of dir, None for images that could not be read
+def get_hashes(dir, cache_dir, num_workers=1):
+    abs_dir = os.path.abspath(dir)
+    results_path = os.path.join(cache_dir, 'dhash_%s.json' % hashlib.sha1(abs_dir.encode('utf-8')).hexdigest()[:16])
+    results = {}
+    if os.path.isfile(results_path):
+        with open(results_path) as f:
+            cached = json.load(f)
+        if cached.get('version') == DEDUP_VERSION and cached.get('root') == abs_dir:
+            results = cached['files']
+
+    hashed, todo = {}, []
+    for path in make_dataset(dir):
+        rel = os.path.relpath(path, dir)
+        st = os.stat(path)
+        entry = results.get(rel)
+        if entry is not None and entry[:2] == [st.st_size, st.st_mtime_ns]:
+            hashed[rel] = entry
+        else:
+            todo.append(path)
+    print('dhash %s: %d images, %d to hash' % (dir, len(hashed) + len(todo), len(todo)))
+
+    pool = Pool(num_workers) if num_workers > 1 and len(todo) > 1 else None
+    entries = pool.imap_unordered(_hash, todo, chunksize=16) if pool else map(_hash, todo)
+    for i, (path, entry) in enumerate(entries):
+        hashed[os.path.relpath(path, dir)] = entry
+        if (i + 1) % 1000 == 0:
+            print('    hashed: %d/%d' % (i + 1, len(todo)))
+    if pool:
+        pool.close()
+        pool.join()
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    with open(results_path + '.tmp', 'w') as f:
+        json.dump({'version': DEDUP_VERSION, 'root': abs_dir, 'files': hashed}, f)
+    os.replace(results_path + '.tmp', results_path)
+    return dict((os.path.join(dir, rel), entry[2]) for rel, entry in hashed.items())
+
+
+class MultiIndexHash():
+    def __init__(self, radius, bits=HASH_BITS):
+        assert 0 <= radius < bits, 'radius must be in [0, %d), got %d' % (bits, radius)
+        self.radius = radius
+        # radius + 1 substrings of (almost) equal width. Python ints: shifts
+        # by numpy ints overflow for hashes with bit 63 set
+        bounds = [bits * k // (radius + 1) for k in range(radius + 2)]
+        self.masks = [((1 << (hi - lo)) - 1, lo) for lo, hi in zip(bounds[:-1], bounds[1:])]
+        self.tables = [{} for _ in self.masks]
+        self.hashes = []
+        self.keys = []
+
+    def add(self, key, h):
+        index = len(self.hashes)
+        self.hashes.append(h)
+        self.keys.append(key)
+        for table, (mask, shift) in zip(self.tables, self.masks):
+            table.setdefault((h >> shift) & mask, []).append(index)
+
+    # (distance, key) of the indexed hashes within radius of h, closest first
+    def query(self, h):
+        candidates = set()
+        for table, (mask, shift) in zip(self.tables, self.masks):
+            candidates.update(table.get((h >> shift) & mask, ()))
+        matches = [(hamming(h, self.hashes[i]), i) for i in candidates]
+        return [(d, self.keys[i]) for d, i in sorted(matches) if d <= self.radius]
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+# {representative: [members]} of the {path: hash} in path order, see above
+def cluster(hashes, radius):
+    index = MultiIndexHash(radius)
+    clusters = {}
+    for path in sorted(hashes):
+        h = hashes[path]
+        matches = index.query(h) if h is not None else []
+        if matches:
+            clusters[matches[0][1]].append(path)
+        else:
+            clusters[path] = [path]
+            if h is not None:
+                index.add(path, h)
+    return clusters
+
+
+def write_dedup(dir, clusters, radius):
+    rel = lambda path: os.path.relpath(path, dir)
+    manifest = {'version': DEDUP_VERSION, 'radius': radius,
+                'keep': sorted(rel(path) for path in clusters),
+                'clusters': dict((rel(path), [rel(m) for m in members]) for path, members in clusters.items()
+                                 if len(members) > 1)}
+    path = os.path.join(dir, DEDUP)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+# [(test path, closest train path, distance)] for the test images with a
+# near-duplicate in train
+def find_overlap(train_hashes, test_hashes, radius):
+    index = MultiIndexHash(radius)
+    for path, h in train_hashes.items():
+        if h is not None:
+            index.add(path, h)
+    overlap = []
+    for path in sorted(test_hashes):
+        h = test_hashes[path]
+        matches = index.query(h) if h is not None else []
+        if matches:
+            overlap.append((path, matches[0][1], matches[0][0]))
+    return overlap
@@ -0,0 +1,100 @@
+import math
+import time
+import torch
+import torch.nn.functional as F
+from data import batch_transform
+
+
+# x shifted by (i - margin, j - margin) pixels per sample, borders replicated
+def shift(x, margin, i, j):
+    n, c, h, w = x.shape
+    # replicate padding is only implemented for float tensors
+    padded = F.pad(x.float(), (margin,) * 4, mode='replicate').to(x.dtype)
+    rows = (i.to(x.device).view(n, 1) + torch.arange(h, device=x.device)).view(n, 1, h, 1)
+    cols = (j.to(x.device).view(n, 1) + torch.arange(w, device=x.device)).view(n, 1, 1, w)
+    batch = torch.arange(n, device=x.device).view(n, 1, 1, 1)
+    channels = torch.arange(c, device=x.device).view(1, c, 1, 1)
+    return padded[batch, channels, rows, cols]
+
+
+# Data echoing for --echo: when the loader cannot keep up with the model,
+# every loaded batch is given to the trainer up to max_factor times, the
+# repeats with a new random flip and shift of every image, so the compute
+# idle time is spent on slightly different samples instead of waiting.
+# Repeats are marked with batch['echo'] = repeat (1, 2, ...), so that the
+# trainer does not count them as new samples.
+# The factor is ceil(loader time / step time), from moving averages of the
+# time of one step and of the loader time per batch: the wait for a batch
+# plus the time spent stepping since the previous one. A batch that was
+# ready only bounds the loader time from above; it is counted one step
+# lower, so that the factor comes down again when the loader gets faster.
+class DataEcho():
+    def __init__(self, opt, max_factor, shift, momentum=0.9):
+        self.opt = opt
+        self.max_factor = max(1, max_factor)
+        self.shift = shift
+        self.momentum = momentum
+        self.factor = 1
+        self.loader_time = None
+        self.step = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.batches = 0
+        self.steps = 0
+
+    # average # of steps per loaded batch since the last reset
+    def average_factor(self):
+        return float(self.steps) / max(1, self.batches)
+
+    def _average(self, old, new):
+        return new if old is None else self.momentum * old + (1 - self.momentum) * new
+
+    def _adapt(self, wait, stepping):
+        if self.step is None:
+            return
+        loader_time = wait + stepping
+        if wait < 0.05 * self.step:
+            loader_time = max(0.0, loader_time - self.step)
+        self.loader_time = self._average(self.loader_time, loader_time)
+        self.factor = int(min(self.max_factor, max(1, math.ceil(self.loader_time / self.step))))
+
+    # same random flip and shift for every image of a sample, so aligned A/B
+    # stay aligned. Images are [N, C, H, W] or [N, M, C, H, W], any dtype.
+    def augment(self, batch):
+        images = [k for k, v in batch.items() if torch.is_tensor(v) and v.dim() >= 4]
+        if not images:
+            return batch
+        n = batch[images[0]].size(0)
+        mask = batch_transform.random_flip_mask(n, self.opt)
+        i, j = torch.randint(0, 2 * self.shift + 1, (n,)), torch.randint(0, 2 * self.shift + 1, (n,))
+        batch = dict(batch)
+        for key in images:
+            x = batch[key]
+            shape = x.shape
+            x = x.reshape(n, -1, shape[-2], shape[-1])
+            if self.shift > 0:
+                x = shift(x, self.shift, i, j)
+            x = batch_transform.flip(x, mask)
+            batch[key] = x.reshape(shape)
+        return batch
+
+    def feed(self, batches):
+        batches = iter(batches)
+        stepping = 0.0
+        while True:
+            start = time.time()
+            try:
+                batch = next(batches)
+            except StopIteration:
+                return
+            self._adapt(time.time() - start, stepping)
+            self.batches += 1
+            stepping = 0.0
+            for repeat in range(self.factor):
+                start = time.time()
+                yield batch if repeat == 0 else dict(self.augment(batch), echo=repeat)
+                elapsed = time.time() - start
+                self.step = self._average(self.step, elapsed)
+                stepping += elapsed
+                self.steps += 1
@@ -8,6 +8,10 @@
 import torch.utils.data as data
 
 from PIL import Image
+from data import profiling
+import hashlib
+import io
+import json
 import os
 import os.path
 
@@ -21,27 +25,152 @@ def is_image_file(filename):
     return any(filename.endswith(extension) for extension in IMG_EXTENSIONS)
 
 
-def make_dataset(dir):
+def make_dataset(dir, cache_dir=None, quarantine=True, dedup=False):
     images = []
     assert os.path.isdir(dir), '%s is not a valid directory' % dir
 
-    for root, _, fnames in sorted(os.walk(dir)):
-        for fname in fnames:
-            if is_image_file(fname):
-                path = os.path.join(root, fname)
-                images.append(path)
+    if cache_dir is not None:
+        images = _make_dataset_cached(dir, cache_dir)
+    else:
+        for root, _, fnames in sorted(os.walk(dir)):
+            for fname in fnames:
+                if is_image_file(fname):
+                    path = os.path.join(root, fname)
+                    images.append(path)
+
+    if quarantine:
+        # images prescan.py found broken
+        quarantined = read_quarantine(dir)
+        if quarantined:
+            images = [path for path in images if os.path.relpath(path, dir) not in quarantined]
+    if dedup:
+        # representatives of the near-duplicate clusters of dedup_dataset.py
+        keep = read_dedup(dir)
+        if keep is None:
+            print('no %s in %s, all images are used' % (DEDUP, dir))
+        else:
+            images = [path for path in images if os.path.relpath(path, dir) in keep]
+    return images
+
+
+# [dir]/quarantine.json maps the paths (relative to dir) of the images that
+# failed data.prescan to the error, make_dataset leaves them out.
+QUARANTINE = 'quarantine.json'
+
+
+def read_quarantine(dir):
+    path = os.path.join(dir, QUARANTINE)
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)['files']
+
+
+# [dir]/dedup.json lists the images (relative to dir) kept by data.dedup,
+# one per cluster of near-duplicate frames, and the clusters themselves.
+DEDUP = 'dedup.json'
+
+
+def read_dedup(dir):
+    path = os.path.join(dir, DEDUP)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return set(json.load(f)['keep'])
+
+
+# Persistent file index: for every directory of the tree we keep its image
+# files and subdirectories together with the directory stat (mtime, inode,
+# link count). Adding, removing or renaming an entry changes the mtime of its
+# parent directory, so only directories whose stat changed are listed again;
+# the others only cost one stat call.
+INDEX_VERSION = 1
+
+
+def _dir_stamp(st):
+    return [st.st_mtime_ns, st.st_ino, st.st_nlink]
+
+
+def _scan_dir(root, rel, index, new_index):
+    # index is keyed by the path relative to the scanned root, so the
+    # returned paths keep the prefix the caller passed in
+    path = os.path.join(root, rel) if rel else root
+    stamp = _dir_stamp(os.stat(path))
+    entry = index.get(rel)
+    if entry is None or entry['stamp'] != stamp:
+        fnames, subdirs = [], []
+        for e in os.scandir(path):
+            # same rules as os.walk: symlinked directories are not followed
+            if e.is_dir():
+                if not e.is_symlink():
+                    subdirs.append(e.name)
+            elif is_image_file(e.name):
+                fnames.append(e.name)
+        entry = {'stamp': stamp, 'files': sorted(fnames), 'dirs': sorted(subdirs)}
+    new_index[rel] = entry
+    images = [os.path.join(path, fname) for fname in entry['files']]
+    for subdir in entry['dirs']:
+        images += _scan_dir(root, os.path.join(rel, subdir), index, new_index)
+    return images
 
+
+def _make_dataset_cached(dir, cache_dir):
+    abs_dir = os.path.abspath(dir)
+    index_path = os.path.join(cache_dir, 'index_%s.json' % hashlib.sha1(abs_dir.encode('utf-8')).hexdigest()[:16])
+    index = {}
+    if os.path.isfile(index_path):
+        with open(index_path) as f:
+            cached = json.load(f)
+        if cached.get('version') == INDEX_VERSION and cached.get('root') == abs_dir:
+            index = cached['dirs']
+    new_index = {}
+    images = sorted(_scan_dir(dir, '', index, new_index))
+    if new_index != index:
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(index_path + '.tmp', 'w') as f:
+                json.dump({'version': INDEX_VERSION, 'root': abs_dir, 'dirs': new_index}, f)
+            os.replace(index_path + '.tmp', index_path)
+        except OSError as e:  # e.g. read-only dataroot, the index is only an optimization
+            print('could not write file index %s: %s' % (index_path, e))
     return images
 
 
-def default_loader(path):
-    return Image.open(path).convert('RGB')
+# Opens an image in the given mode. When the final size is known, JPEGs are
+# decoded in draft mode: libjpeg scales by 1/2, 1/4 or 1/8 in the DCT domain,
+# as long as the result stays at least `size` (width, height), so only a
+# small resize is left to the transforms. Use 1 for a dimension that does
+# not matter. mode None keeps the mode of the file.
+def load_image(path, mode='RGB', size=None):
+    if profiling.enabled and isinstance(path, str):
+        # split file reading from decoding for benchmark_data.py
+        with profiling.Timer('read'):
+            with open(path, 'rb') as f:
+                path = io.BytesIO(f.read())
+        with profiling.Timer('decode'):
+            return _decode(path, mode, size)
+    return _decode(path, mode, size)
+
+
+def _decode(path, mode, size):
+    img = Image.open(path)
+    if size is not None and img.format == 'JPEG':
+        img.draft(mode or img.mode, size)
+    if mode is None:
+        img.load()
+        return img
+    return img.convert(mode)
+
+
+def default_loader(path, size=None):
+    return load_image(path, 'RGB', size)
 
 
 class ImageFolder(data.Dataset):
 
     def __init__(self, root, transform=None, return_paths=False,
-                 loader=default_loader):
+                 loader=default_loader, load_size=None):
         imgs = make_dataset(root)
         if len(imgs) == 0:
             raise(RuntimeError("Found 0 images in: " + root + "\n"
@@ -53,10 +182,11 @@ class ImageFolder(data.Dataset):
         self.transform = transform
         self.return_paths = return_paths
         self.loader = loader
+        self.load_size = load_size
 
     def __getitem__(self, index):
         path = self.imgs[index]
-        img = self.loader(path)
+        img = self.loader(path) if self.load_size is None else self.loader(path, self.load_size)
         if self.transform is not None:
             img = self.transform(img)
         if self.return_paths:
@@ -0,0 +1,82 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+from PIL import Image
+from data.base_dataset import to_uint8_tensor
+from data.readahead import read_bytes
+
+# --decode_backend torchvision. A loader worker gets the indices of a whole
+# batch, reads the raw bytes of all its files at once (read_files) and
+# returns them undecoded; augment_batch then decodes the batch together with
+# torchvision.io.decode_jpeg on the model device (nvJPEG on CUDA, one call
+# for the whole list with torchvision >= 0.19). Files that are not JPEGs, or
+# JPEGs torchvision cannot read (e.g. CMYK), are decoded with PIL.
+
+JPEG_MAGIC = b'\xff\xd8\xff'
+READ_THREADS = 8
+
+
+def check_backend():
+    try:
+        import torchvision.io
+    except ImportError:
+        torchvision = None
+    if torchvision is None or not hasattr(torchvision.io, 'decode_jpeg'):
+        raise ValueError('--decode_backend torchvision needs torchvision >= 0.10 (torchvision.io.decode_jpeg)')
+
+
+# raw bytes of every path as 1D uint8 tensors, the files are read on a small
+# thread pool so that their I/O overlaps
+def read_files(paths):
+    chunks = [paths[i::READ_THREADS] for i in range(min(READ_THREADS, len(paths)))]
+    data = [None] * len(paths)
+    with ThreadPoolExecutor(max_workers=max(1, len(chunks))) as pool:
+        for i, chunk in enumerate(pool.map(read_bytes, chunks)):
+            data[i::READ_THREADS] = chunk
+    return [torch.from_numpy(np.frombuffer(bytearray(d), dtype=np.uint8)) for d in data]
+
+
+def is_jpeg(data):
+    return bytes(data[:len(JPEG_MAGIC)].tolist()) == JPEG_MAGIC
+
+
+def _decode_jpegs(data, mode, device):
+    from torchvision.io import decode_jpeg
+    try:
+        return list(decode_jpeg(data, mode=mode, device=device))
+    except (TypeError, RuntimeError):
+        # no list input before torchvision 0.19, or one of the files failed
+        pass
+    images = []
+    for d in data:
+        try:
+            images.append(decode_jpeg(d, mode=mode, device=device))
+        except RuntimeError:
+            images.append(None)
+    return images
+
+
+def _decode_pil(data, mode, device):
+    img = Image.open(io.BytesIO(data.numpy().tobytes()))
+    return to_uint8_tensor(img.convert(mode)).to(device)
+
+
+# data: list of 1D uint8 tensors from read_files, mode: 'L' or
+# 'RGB'. Returns the CxHxW uint8 images on device.
+def decode_batch(data, mode, device):
+    from torchvision.io import ImageReadMode
+    read_mode = ImageReadMode.GRAY if mode == 'L' else ImageReadMode.RGB
+    # decode_jpeg reads its input from host memory, --prefetch may have
+    # staged the bytes on the device already
+    data = [d.cpu() for d in data]
+    images = [None] * len(data)
+    jpegs = [i for i, d in enumerate(data) if is_jpeg(d)]
+    if jpegs:
+        for i, img in zip(jpegs, _decode_jpegs([data[i] for i in jpegs], read_mode, device)):
+            images[i] = img
+    for i, img in enumerate(images):
+        if img is None:
+            images[i] = _decode_pil(data[i], mode, device)
+    return images
@@ -0,0 +1,32 @@
+import glob
+import os
+
+
+# Helpers for the original KAIST layout: setXX/VXXX/{visible,lwir}/IXXXXX.jpg
+
+
+def kaist_sequences(kaist_root, sets):
+    # setXX/VXXX folders of the requested sets, sorted
+    sequences = []
+    for set_name in sets:
+        sequences += sorted(glob.glob(os.path.join(kaist_root, set_name, 'V*')))
+    return [s for s in sequences if os.path.isdir(s)]
+
+
+def kaist_frames(sequence, modality):
+    # frame number -> path
+    frames = glob.glob(os.path.join(sequence, modality, '*.jpg'))
+    return dict((os.path.splitext(os.path.basename(f))[0], f) for f in frames)
+
+
+def paired_frames(sequence, modalities, stride=1):
+    # frames present in every modality, in order, keeping one every `stride`
+    frames = [kaist_frames(sequence, modality) for modality in modalities]
+    common = sorted(set.intersection(*[set(f) for f in frames]))
+    return [(frame, [f[frame] for f in frames]) for frame in common[::stride]]
+
+
+def sample_name(sequence, frame):
+    # set00/V000/I01234 -> set00_V000_I01234.jpg, unique and stable across runs
+    set_name = os.path.basename(os.path.dirname(sequence.rstrip('/')))
+    return '%s_%s_%s.jpg' % (set_name, os.path.basename(sequence.rstrip('/')), frame)
@@ -0,0 +1,95 @@
+import io
+import random
+import torch.utils.data as data
+from data.base_dataset import get_transform, get_load_size, get_image_mode, fixed_normalization
+from data.image_folder import load_image
+from data.kaist import kaist_sequences, paired_frames, sample_name
+from data.readahead import read_ahead
+from data.shards import shuffle_buffer, split_for_worker
+from data.unaligned_dataset import get_transform_modality
+
+
+# Streams the original KAIST layout (setXX/VXXX/{visible,lwir}) without the
+# genDATA/prepare_dataset copy. A samples are the frames of the day sets, with
+# visible and lwir paired by frame number, B samples are the visible frames
+# of the night sets. Sequences are spread over the DataLoader workers and
+# every worker reads its frames in order with a readahead window, so the disk
+# sees sequential reads. Only the modality used by no_input is read (visible
+# for 1, lwir otherwise), which is what UnalignedDataset keeps of the stacked
+# A image.
+class KaistDataset(data.IterableDataset):
+    def initialize(self, opt):
+        self.opt = opt
+        self.root = opt.kaist_root or opt.dataroot
+        if opt.normalize != 'fixed':
+            raise ValueError('dataset_mode kaist only supports --normalize fixed')
+        if opt.dedup:
+            raise ValueError('--dedup is not supported by dataset_mode kaist')
+        self.no_input = opt.no_input
+        self.modality = 'visible' if opt.no_input == 1 else 'lwir'
+        self.stride = max(1, opt.frame_stride)
+        self.A_sequences = kaist_sequences(self.root, opt.day_sets.split(','))
+        self.B_sequences = kaist_sequences(self.root, opt.night_sets.split(','))
+        # (sequence, [(frame, [path])]) in order
+        self.A_frames = [(s, paired_frames(s, ['visible', 'lwir'], self.stride)) for s in self.A_sequences]
+        self.B_frames = [(s, paired_frames(s, ['visible'], self.stride)) for s in self.B_sequences]
+        self.A_size = sum(len(frames) for _, frames in self.A_frames)
+        self.B_size = sum(len(frames) for _, frames in self.B_frames)
+        assert self.A_size > 0 and self.B_size > 0, 'no KAIST frames found in %s' % self.root
+        self.buffer_size = 0 if opt.serial_batches else opt.shuffle_buffer
+        # 1 channel modalities are decoded as 'L', as in UnalignedDataset
+        self.mode_A = get_image_mode(opt.input_nc)
+        self.mode_B = 'L' if opt.output_nc == 1 else None
+        self.transform = get_transform(opt, fixed_normalization(1 if self.mode_B == 'L' else 3))
+        # every modality is resized to fineSize x fineSize, as the halves of
+        # the stacked A image in UnalignedDataset
+        self.transformA = get_transform_modality(opt, fixed_normalization(1 if self.mode_A == 'L' else 3))
+        self.load_size_A = None if opt.no_draft else (opt.fineSize, opt.fineSize)
+        self.load_size_B = get_load_size(opt)
+        self.seed = random.getrandbits(31)
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _items(self, sequences, modality_index):
+        for sequence, frames in sequences:
+            for frame, paths in frames:
+                yield sample_name(sequence, frame), [paths[modality_index]]
+
+    def _stream(self, sequences, modality_index, rng):
+        samples = read_ahead(self._items(sequences, modality_index), self.opt.readahead)
+        if self.buffer_size > 1:
+            samples = shuffle_buffer(samples, self.buffer_size, rng)
+        return samples
+
+    def _stream_B(self, rng):
+        while True:
+            sequences = list(self.B_frames)
+            rng.shuffle(sequences)
+            for sample in self._stream(sequences, 0, rng):
+                yield sample
+
+    def __iter__(self):
+        worker_info = data.get_worker_info()
+        worker_id, num_workers = (0, 1) if worker_info is None else (worker_info.id, worker_info.num_workers)
+        rng = random.Random(self.seed + 1000003 * self.epoch + worker_id)
+        if self.buffer_size > 1:
+            A_sequences = split_for_worker(self.A_frames, self.epoch, self.seed, worker_id, num_workers)
+        else:
+            A_sequences = self.A_frames[worker_id::num_workers]
+        modality_index = 0 if self.modality == 'visible' else 1
+        B_stream = self._stream_B(rng)
+        for A_name, A_data in self._stream(A_sequences, modality_index, rng):
+            B_name, B_data = next(B_stream)
+            A = self.transformA(load_image(io.BytesIO(A_data[0]), self.mode_A, self.load_size_A))
+            B = self.transform(load_image(io.BytesIO(B_data[0]), self.mode_B, self.load_size_B))
+            # same layout as UnalignedDataset, a single modality
+            yield {'A': A.unsqueeze(0), 'B': B,
+                   'A_paths': A_name, 'B_paths': B_name}
+
+    def __len__(self):
+        return self.A_size
+
+    def name(self):
+        return 'KaistDataset'
@@ -0,0 +1,68 @@
+import collections
+import time
+import torch
+
+
+def _apply(batch, fn):
+    if torch.is_tensor(batch):
+        return fn(batch)
+    if isinstance(batch, dict):
+        return dict((k, _apply(v, fn)) for k, v in batch.items())
+    if isinstance(batch, list):
+        return [_apply(v, fn) for v in batch]
+    return batch
+
+
+# Keeps `depth` batches staged ahead of the trainer. Host to device copies of
+# the (pinned) loader batches are issued on a side CUDA stream, so they
+# overlap with the compute of the current step, and the model gets tensors
+# already on its device that set_input uses without copying them again.
+# Also accounts the time the trainer spent waiting for the loader.
+class BatchFeeder():
+    def __init__(self, device, depth=2):
+        self.device = device
+        self.depth = max(1, depth)
+        self.stream = torch.cuda.Stream(device) if device.type == 'cuda' else None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.wait_time = 0.0
+        self.steps = 0
+
+    # average milliseconds per step spent waiting for data since the last reset
+    def wait_ms(self):
+        return 1000.0 * self.wait_time / max(1, self.steps)
+
+    def _stage(self, batch):
+        if self.stream is None:
+            return batch
+        with torch.cuda.stream(self.stream):
+            return _apply(batch, lambda t: t.to(self.device, non_blocking=True))
+
+    def _ready(self, batch):
+        if self.stream is not None:
+            current = torch.cuda.current_stream(self.device)
+            current.wait_stream(self.stream)
+            # the caching allocator must not reuse the memory before the
+            # compute stream is done with it
+            _apply(batch, lambda t: t.record_stream(current))
+        return batch
+
+    def feed(self, batches):
+        batches = iter(batches)
+        staged = collections.deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(staged) < self.depth:
+                start = time.time()
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    exhausted = True
+                    break
+                self.wait_time += time.time() - start
+                staged.append(self._stage(batch))
+            if not staged:
+                return
+            self.steps += 1
+            yield self._ready(staged.popleft())
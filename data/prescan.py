@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+
+from PIL import Image
+from data.image_folder import make_dataset, QUARANTINE
+
+
+# Checks every image of a folder before training: the header and structure
+# (Image.verify) and a full decode, so that truncated files are caught
+# too. Images that fail are written to [dir]/quarantine.json, which
+# make_dataset honours. Results are kept in
+# <cache_dir>/prescan_<hash of dir>.json with the size and mtime of every
+# file, only new or changed files are checked again.
+
+PRESCAN_VERSION = 1
+
+
+def check_image(path):
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        # verify() does not decode the pixel data
+        with Image.open(path) as img:
+            img.load()
+    except Exception as e:  # PIL raises OSError, SyntaxError, ValueError, ... on broken files
+        return '%s: %s' % (type(e).__name__, e)
+    return None
+
+
+def _check(path):
+    st = os.stat(path)
+    return path, [st.st_size, st.st_mtime_ns, check_image(path)]
+
+
+def write_quarantine(dir, quarantined):
+    path = os.path.join(dir, QUARANTINE)
+    if not quarantined:
+        if os.path.isfile(path):
+            os.remove(path)
+        return
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'version': PRESCAN_VERSION, 'files': quarantined}, f, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def prescan(dir, cache_dir, num_workers=1):
+    abs_dir = os.path.abspath(dir)
+    results_path = os.path.join(cache_dir, 'prescan_%s.json' % hashlib.sha1(abs_dir.encode('utf-8')).hexdigest()[:16])
+    results = {}
+    if os.path.isfile(results_path):
+        with open(results_path) as f:
+            cached = json.load(f)
+        if cached.get('version') == PRESCAN_VERSION and cached.get('root') == abs_dir:
+            results = cached['files']
+
+    checked, todo = {}, []
+    for path in make_dataset(dir, quarantine=False):
+        rel = os.path.relpath(path, dir)
+        st = os.stat(path)
+        entry = results.get(rel)
+        if entry is not None and entry[:2] == [st.st_size, st.st_mtime_ns]:
+            checked[rel] = entry
+        else:
+            todo.append(path)
+    print('prescan %s: %d images, %d to check' % (dir, len(checked) + len(todo), len(todo)))
+
+    pool = Pool(num_workers) if num_workers > 1 and len(todo) > 1 else None
+    entries = pool.imap_unordered(_check, todo, chunksize=16) if pool else map(_check, todo)
+    for i, (path, entry) in enumerate(entries):
+        checked[os.path.relpath(path, dir)] = entry
+        if (i + 1) % 1000 == 0:
+            print('    checked: %d/%d' % (i + 1, len(todo)))
+    if pool:
+        pool.close()
+        pool.join()
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    with open(results_path + '.tmp', 'w') as f:
+        json.dump({'version': PRESCAN_VERSION, 'root': abs_dir, 'files': checked}, f)
+    os.replace(results_path + '.tmp', results_path)
+
+    quarantined = dict((rel, entry[2]) for rel, entry in checked.items() if entry[2] is not None)
+    for rel in sorted(quarantined):
+        print('    quarantined %s: %s' % (os.path.join(dir, rel), quarantined[rel]))
+    write_quarantine(dir, quarantined)
+    return quarantined
@@ -0,0 +1,32 @@
+import time
+
+# Per-process stage timings used by benchmark_data.py. load_image reports
+# the time spent reading and decoding files when `enabled` is set; nothing
+# is recorded otherwise.
+enabled = False
+_stages = {}
+
+
+def record(stage, seconds):
+    _stages[stage] = _stages.get(stage, 0.0) + seconds
+
+
+def reset():
+    _stages.clear()
+
+
+def stages():
+    return dict(_stages)
+
+
+class Timer():
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        if enabled:
+            record(self.stage, time.perf_counter() - self.start)
@@ -0,0 +1,78 @@
+import collections
+import io
+from concurrent.futures import ThreadPoolExecutor
+import torch.utils.data as data
+
+
+def read_bytes(paths):
+    data = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            data.append(f.read())
+    return data
+
+
+# Reads the files of the next `depth` items on a thread pool while the
+# current one is being decoded. items yields (key, [paths]) in the order they
+# will be consumed; (key, [bytes]) is yielded back in the same order.
+def read_ahead(items, depth, num_threads=4):
+    if depth <= 0:
+        for key, paths in items:
+            yield key, read_bytes(paths)
+        return
+    items = iter(items)
+    pending = collections.deque()
+    with ThreadPoolExecutor(max_workers=num_threads) as pool:
+        for key, paths in items:
+            pending.append((key, pool.submit(read_bytes, paths)))
+            if len(pending) >= depth:
+                key, future = pending.popleft()
+                yield key, future.result()
+        while pending:
+            key, future = pending.popleft()
+            yield key, future.result()
+
+
+# Sampler item of a ReadaheadSampler: the dataset index with the bytes of
+# the files it will open, keyed by path
+class Prefetched():
+    def __init__(self, index, files):
+        self.index = index
+        self.files = files
+
+    def open(self, path):
+        return io.BytesIO(self.files[path]) if path in self.files else path
+
+
+# (index, open) for a dataset __getitem__, open(path) gives what to pass to
+# load_image: the bytes read ahead as a file object, or the path itself
+def unwrap(index):
+    if isinstance(index, Prefetched):
+        return index.index, index.open
+    return index, lambda path: path
+
+
+# Wraps the sampler of a map-style dataset for --io_threads. The indices are
+# drawn in the main process, resolved by dataset.sample_files(index) ->
+# (index, [paths]) and the files of the next `depth` samples are read on a
+# thread pool, so that on slow or network-mounted dataroots the open/read
+# latency overlaps with decoding and compute. The loader workers get
+# Prefetched items and only decode bytes that are already in memory.
+class ReadaheadSampler(data.Sampler):
+    def __init__(self, sampler, dataset, depth, num_threads):
+        self.sampler = sampler
+        self.dataset = dataset
+        self.depth = depth
+        self.num_threads = num_threads
+
+    def _items(self):
+        for index in self.sampler:
+            index, paths = self.dataset.sample_files(index)
+            yield (index, paths), paths
+
+    def __iter__(self):
+        for (index, paths), files in read_ahead(self._items(), self.depth, self.num_threads):
+            yield Prefetched(index, dict(zip(paths, files)))
+
+    def __len__(self):
+        return len(self.sampler)
@@ -0,0 +1,95 @@
+import numpy as np
+import torch.utils.data as data
+
+
+# Draws the (index_A, index_B) pairs of an unaligned dataset from a seed and
+# the epoch number instead of the global `random` module of every worker, so
+# an epoch is reproducible, pairs are not duplicated across workers and the
+# epoch can be split over world_size processes. set_epoch(epoch, start)
+# skips the first `start` samples of this rank, which lets a resumed run
+# continue exactly where it stopped without replaying the loader.
+class PairingSampler(data.Sampler):
+    def __init__(self, A_size, B_size, length, seed=0, shuffle=True, rank=0, world_size=1):
+        assert 0 <= rank < world_size, 'rank %d not in world_size %d' % (rank, world_size)
+        self.A_size = A_size
+        self.B_size = B_size
+        self.length = length
+        self.seed = seed
+        self.shuffle = shuffle
+        self.rank = rank
+        self.world_size = world_size
+        self.num_samples = (length + world_size - 1) // world_size
+        self.epoch = 0
+        self.start = 0
+
+    def set_epoch(self, epoch, start=0):
+        self.epoch = epoch
+        self.start = start
+
+    def pairs(self, epoch):
+        rng = np.random.RandomState((self.seed * 1000003 + epoch) % (2 ** 32))
+        order = rng.permutation(self.length) if self.shuffle else np.arange(self.length)
+        index_B = rng.randint(0, self.B_size, size=self.length)
+        index_A = order % self.A_size
+        # pad so that every rank gets the same number of samples
+        total = self.num_samples * self.world_size
+        if total > self.length:
+            index_A = np.concatenate([index_A, index_A[:total - self.length]])
+            index_B = np.concatenate([index_B, index_B[:total - self.length]])
+        return index_A[self.rank::self.world_size], index_B[self.rank::self.world_size]
+
+    def __iter__(self):
+        index_A, index_B = self.pairs(self.epoch)
+        for a, b in zip(index_A[self.start:], index_B[self.start:]):
+            yield int(a), int(b)
+
+    def __len__(self):
+        return self.num_samples - self.start
+
+
+# PairingSampler that draws the A indices with a probability that grows with
+# their cycle loss, so that frames the generators already reproduce well are
+# visited less often. record() keeps the per sample losses reported by the
+# model (CycleGANModel.get_sample_losses) without synchronizing the device;
+# they are folded into a float32 moving average per A sample when the next
+# epoch is drawn. Probabilities are loss ** (1 / temperature), mixed with
+# the uniform distribution so that every sample keeps at least `floor`
+# times its uniform probability. Samples without a loss yet count as the
+# largest loss seen, so they are visited early. B stays uniformly paired.
+class LossAwareSampler(PairingSampler):
+    def __init__(self, A_size, B_size, length, seed=0, temperature=1.0, floor=0.1, momentum=0.5):
+        assert temperature > 0, 'temperature must be positive, got %f' % temperature
+        assert 0 <= floor <= 1, 'floor must be in [0, 1], got %f' % floor
+        super(LossAwareSampler, self).__init__(A_size, B_size, length, seed=seed)
+        self.temperature = temperature
+        self.floor = floor
+        self.momentum = momentum
+        self.losses = np.full(A_size, np.nan, dtype=np.float32)
+        self.pending = []
+
+    def record(self, index_A, losses):
+        self.pending.append((index_A, losses))
+
+    def _flush(self):
+        for index_A, losses in self.pending:
+            index_A = np.asarray(index_A.cpu() if hasattr(index_A, 'cpu') else index_A, dtype=np.int64)
+            losses = np.asarray(losses.cpu() if hasattr(losses, 'cpu') else losses, dtype=np.float32)
+            old = self.losses[index_A]
+            self.losses[index_A] = np.where(np.isnan(old), losses, self.momentum * old + (1 - self.momentum) * losses)
+        self.pending = []
+
+    def probabilities(self):
+        self._flush()
+        seen = ~np.isnan(self.losses)
+        if not seen.any():
+            return np.full(self.A_size, 1.0 / self.A_size)
+        losses = np.where(seen, self.losses, self.losses[seen].max()).astype(np.float64)
+        weights = np.maximum(losses, 1e-8) ** (1.0 / self.temperature)
+        return (1 - self.floor) * weights / weights.sum() + self.floor / self.A_size
+
+    def pairs(self, epoch):
+        p = self.probabilities()
+        rng = np.random.RandomState((self.seed * 1000003 + epoch) % (2 ** 32))
+        index_A = rng.choice(self.A_size, size=self.length, p=p / p.sum())
+        index_B = rng.randint(0, self.B_size, size=self.length)
+        return index_A, index_B
@@ -0,0 +1,75 @@
+import os.path
+import random
+import torch.utils.data as data
+from data.base_dataset import get_transform, get_load_size, get_image_mode, fixed_normalization
+from data.shards import read_shard_index, iter_shards, shuffle_buffer, decode, split_for_worker
+from data.unaligned_dataset import get_transform_A, stack_modalities
+
+
+# Streaming counterpart of UnalignedDataset reading the tar shards written by
+# write_shards.py. A shards are spread over the DataLoader workers, every
+# worker streams B from all the B shards, and both streams go through a
+# bounded shuffle buffer of encoded bytes, so memory does not grow with the
+# dataset. One epoch is one pass over A.
+class ShardedDataset(data.IterableDataset):
+    def initialize(self, opt):
+        self.opt = opt
+        self.root = opt.dataroot
+        if opt.normalize != 'fixed':
+            raise ValueError('dataset_mode sharded only supports --normalize fixed')
+        if opt.dedup:
+            raise ValueError('--dedup is not supported by dataset_mode sharded')
+        self.shard_dir = opt.shard_dir or os.path.join(opt.dataroot, 'shards')
+        self.no_input = opt.no_input
+        self.A_shards, self.A_size = read_shard_index(self.shard_dir, opt.phase + 'A')
+        self.B_shards, self.B_size = read_shard_index(self.shard_dir, opt.phase + 'B')
+        self.buffer_size = 0 if opt.serial_batches else opt.shuffle_buffer
+        # 1 channel modalities are decoded as 'L', as in UnalignedDataset
+        self.mode_A = get_image_mode(opt.input_nc)
+        self.mode_B = 'L' if opt.output_nc == 1 else None
+        self.transform = get_transform(opt, fixed_normalization(1 if self.mode_B == 'L' else 3))
+        self.transformA = get_transform_A(opt, fixed_normalization(1 if self.mode_A == 'L' else 3))
+        self.load_size_A = None if opt.no_draft else (opt.fineSize, opt.fineSize * 2)
+        self.load_size_B = get_load_size(opt)
+        self.seed = random.getrandbits(31)
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _stream(self, shards, rng):
+        samples = iter_shards(shards)
+        if self.buffer_size > 1:
+            samples = shuffle_buffer(samples, self.buffer_size, rng)
+        return samples
+
+    def _stream_B(self, rng):
+        while True:
+            shards = list(self.B_shards)
+            if self.buffer_size > 1:
+                rng.shuffle(shards)
+            for sample in self._stream(shards, rng):
+                yield sample
+
+    def __iter__(self):
+        worker_info = data.get_worker_info()
+        worker_id, num_workers = (0, 1) if worker_info is None else (worker_info.id, worker_info.num_workers)
+        rng = random.Random(self.seed + 1000003 * self.epoch + worker_id)
+        if self.buffer_size > 1:
+            A_shards = split_for_worker(self.A_shards, self.epoch, self.seed, worker_id, num_workers)
+        else:
+            A_shards = self.A_shards[worker_id::num_workers]
+        B_stream = self._stream_B(rng)
+        for A_name, A_data in self._stream(A_shards, rng):
+            B_name, B_data = next(B_stream)
+            A_img = self.transformA(decode(A_data, self.mode_A, self.load_size_A))
+            A = stack_modalities(A_img, self.no_input)
+            B = self.transform(decode(B_data, self.mode_B, self.load_size_B))
+            yield {'A': A, 'B': B,
+                   'A_paths': A_name, 'B_paths': B_name}
+
+    def __len__(self):
+        return self.A_size
+
+    def name(self):
+        return 'ShardedDataset'
@@ -0,0 +1,85 @@
+import io
+import json
+import os
+import random
+import tarfile
+
+
+# Shards are plain tar files holding the original encoded image files, so a
+# whole shard is read with one sequential pass. <name>.json lists the shards
+# of a split together with the number of samples in each of them.
+
+
+def shard_index_path(shard_dir, name):
+    return os.path.join(shard_dir, name + '.json')
+
+
+def write_shards(paths, shard_dir, name, shard_size=1000):
+    if not os.path.isdir(shard_dir):
+        os.makedirs(shard_dir)
+    shards = []
+    for start in range(0, len(paths), shard_size):
+        shard_name = '%s-%06d.tar' % (name, len(shards))
+        shard_path = os.path.join(shard_dir, shard_name)
+        chunk = paths[start:start + shard_size]
+        with tarfile.open(shard_path + '.tmp', 'w') as tar:
+            for i, path in enumerate(chunk):
+                # keep the original name as member name, prefixed with the
+                # global index to keep it unique across subdirectories
+                tar.add(path, arcname='%09d_%s' % (start + i, os.path.basename(path)))
+        os.replace(shard_path + '.tmp', shard_path)
+        shards.append([shard_name, len(chunk)])
+        print('    %s: %d samples' % (shard_name, len(chunk)))
+    with open(shard_index_path(shard_dir, name), 'w') as f:
+        json.dump({'shards': shards, 'size': len(paths)}, f)
+    return shards
+
+
+def read_shard_index(shard_dir, name):
+    path = shard_index_path(shard_dir, name)
+    assert os.path.isfile(path), '%s not found, run write_shards.py first' % path
+    with open(path) as f:
+        index = json.load(f)
+    return [os.path.join(shard_dir, shard) for shard, _ in index['shards']], index['size']
+
+
+def iter_shard(shard_path):
+    # streaming mode: members are read in order, nothing is seeked
+    with tarfile.open(shard_path, 'r|') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            yield member.name, tar.extractfile(member).read()
+
+
+def iter_shards(shard_paths):
+    for shard_path in shard_paths:
+        for sample in iter_shard(shard_path):
+            yield sample
+
+
+def shuffle_buffer(samples, buffer_size, rng):
+    # bounded shuffle: keep buffer_size samples in memory and emit a random
+    # one each time a new sample comes in
+    buf = []
+    for sample in samples:
+        if len(buf) < buffer_size:
+            buf.append(sample)
+            continue
+        i = rng.randint(0, buffer_size - 1)
+        yield buf[i]
+        buf[i] = sample
+    rng.shuffle(buf)
+    for sample in buf:
+        yield sample
+
+
+def decode(data, mode=None, size=None):
+    from data.image_folder import load_image
+    return load_image(io.BytesIO(data), mode, size)
+
+
+def split_for_worker(items, epoch, seed, worker_id, num_workers):
+    items = list(items)
+    random.Random(seed + epoch).shuffle(items)
+    return items[worker_id::num_workers]
@@ -0,0 +1,105 @@
+import hashlib
+import multiprocessing
+
+import numpy as np
+import torch
+from PIL import Image
+from data.image_folder import load_image
+
+# Decoded images shared by all the DataLoader workers. The cache is created
+# by the dataset in the main process, before the workers start, as a fixed
+# number of fixed-size slots in shared memory (torch tensors moved with
+# share_memory_()), so every worker sees the images decoded by the others
+# and they survive across epochs. A slot holds one uint8 array keyed by a
+# hash of (path, mode, size); the least recently used slot is evicted when
+# the cache is full. Images larger than a slot are decoded every time.
+# Two workers missing the same image at the same time both decode it, the
+# second put is then a no-op.
+
+# slot size when the decoded size is not known in advance, a 1080p RGB image
+DEFAULT_SLOT_BYTES = 1920 * 1080 * 3
+# array shapes Image.fromarray turns back into the same mode
+CACHED_MODES = ('L', 'RGB', 'RGBA')
+
+
+# Bytes needed by an image decoded with draft size (width, height), draft
+# mode decodes to less than twice the requested size in each dimension.
+def slot_bytes(size):
+    if size is None or min(size) <= 1:
+        return DEFAULT_SLOT_BYTES
+    return 2 * size[0] * 2 * size[1] * 3
+
+
+class SharedImageCache():
+    HITS, MISSES, EVICTIONS, CLOCK = range(4)
+
+    def __init__(self, size_bytes, slot_bytes):
+        self.slot_bytes = slot_bytes
+        self.num_slots = max(1, size_bytes // slot_bytes)
+        self.data = torch.empty(self.num_slots, slot_bytes, dtype=torch.uint8).share_memory_()
+        self.keys = torch.full((self.num_slots,), -1, dtype=torch.int64).share_memory_()
+        # (height, width, channels), channels 0 for 2D 'L' arrays
+        self.shapes = torch.zeros(self.num_slots, 3, dtype=torch.int64).share_memory_()
+        self.last_used = torch.zeros(self.num_slots, dtype=torch.int64).share_memory_()
+        self.counters = torch.zeros(4, dtype=torch.int64).share_memory_()
+        self.lock = multiprocessing.Lock()
+
+    def name(self):
+        return 'SharedImageCache'
+
+    def _find(self, key):
+        slots = (self.keys == key).nonzero()
+        return int(slots[0]) if len(slots) else None
+
+    def _touch(self, slot):
+        self.counters[self.CLOCK] += 1
+        self.last_used[slot] = self.counters[self.CLOCK]
+
+    def get(self, key):
+        with self.lock:
+            slot = self._find(key)
+            if slot is None:
+                self.counters[self.MISSES] += 1
+                return None
+            self.counters[self.HITS] += 1
+            self._touch(slot)
+            h, w, c = self.shapes[slot].tolist()
+            shape = (h, w, c) if c else (h, w)
+            # copied out under the lock, the slot may be reused right after
+            return self.data[slot, :int(np.prod(shape))].numpy().reshape(shape).copy()
+
+    def put(self, key, array):
+        if array.nbytes > self.slot_bytes:
+            return
+        with self.lock:
+            if self._find(key) is not None:
+                return
+            free = (self.keys == -1).nonzero()
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(self.last_used.argmin())
+                self.counters[self.EVICTIONS] += 1
+            # PIL arrays are read-only, they are copied without wrapping them in a tensor
+            self.data[slot, :array.nbytes].numpy()[:] = array.reshape(-1)
+            h, w = array.shape[:2]
+            self.shapes[slot] = torch.tensor([h, w, array.shape[2] if array.ndim == 3 else 0])
+            self.keys[slot] = key
+            self._touch(slot)
+
+    # drop-in replacement of image_folder.load_image
+    def load_image(self, path, mode='RGB', size=None):
+        key = int(hashlib.sha1(repr((path, mode, size)).encode()).hexdigest()[:15], 16)
+        array = self.get(key)
+        if array is not None:
+            return Image.fromarray(array)
+        img = load_image(path, mode, size)
+        if img.mode in CACHED_MODES:
+            self.put(key, np.asarray(img))
+        return img
+
+    def stats(self):
+        counters = self.counters.tolist()
+        return {'hits': counters[self.HITS], 'misses': counters[self.MISSES],
+                'evictions': counters[self.EVICTIONS],
+                'used': int((self.keys != -1).sum()), 'slots': self.num_slots}
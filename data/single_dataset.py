@@ -1,37 +1,90 @@
 import os.path
 import torchvision.transforms as transforms
-from data.base_dataset import BaseDataset, get_transform
+from data.base_dataset import BaseDataset, get_transform, get_load_size, get_output_size, get_index_cache_dir, \
+    get_decoded_cache, get_image_loader, get_image_mode, get_normalization, get_dataset_normalization, prescan_dir, \
+    random_crop_flip, array_to_tensor, to_uint8_tensor
+from data import batch_transform
 from data.image_folder import make_dataset
+from data.jpeg_decoder import read_files, decode_batch
+from data.readahead import unwrap
 from PIL import Image
 
 
 class SingleDataset(BaseDataset):
+    bucket_key = 'A'
+    decode_backends = ('pil', 'torchvision')
+
     def initialize(self, opt):
         self.opt = opt
         self.root = opt.dataroot
         self.dir_A = os.path.join(opt.dataroot)
+        prescan_dir(opt, self.dir_A)
 
-        self.A_paths = make_dataset(self.dir_A)
+        self.A_paths = make_dataset(self.dir_A, get_index_cache_dir(opt), dedup=opt.dedup)
 
         self.A_paths = sorted(self.A_paths)
 
-        self.transform = get_transform(opt)
-
-    def __getitem__(self, index):
-        A_path = self.A_paths[index]
-        A_img = Image.open(A_path).convert('RGB')
-        A = self.transform(A_img)
         if self.opt.which_direction == 'BtoA':
             input_nc = self.opt.output_nc
         else:
             input_nc = self.opt.input_nc
+        # decoded as 'L' for input_nc == 1, instead of converting the RGB tensor
+        self.mode = get_image_mode(input_nc)
+        # the images are the input domain of the model, normalized with the
+        # statistics of its training run (of the folder itself when training)
+        key, other = ('B', 'A') if self.opt.which_direction == 'BtoA' else ('A', 'B')
+        normalization = get_dataset_normalization(
+            opt, lambda: {key: get_normalization(opt, self.dir_A, mode=self.mode)[0]})
+        self.norm = normalization[key]
+        self.normalization = {'A': self.norm}
+        if other in normalization:
+            # the output domain, to show the generated images
+            self.normalization['B'] = normalization[other]
+        self.transform = get_transform(opt, self.norm)
+        self.load_size = get_load_size(opt)
+        self.load_image, self.shm_cache = get_image_loader(opt, [self.load_size])
 
-        if input_nc == 1:  # RGB to gray
-            tmp = A[0, ...] * 0.299 + A[1, ...] * 0.587 + A[2, ...] * 0.114
-            A = tmp.unsqueeze(0)
+        self.cache_A = None
+        if opt.decoded_cache:
+            self.cache_A = get_decoded_cache(opt, self.dir_A, self.A_paths, (opt.loadSize, opt.loadSize), self.mode)
 
+    def __getitem__(self, index):
+        if isinstance(index, list):
+            return self.get_batch(index)
+        index, open_file = unwrap(index)
+        A_path = self.A_paths[index]
+        if self.opt.batch_augment:
+            A = self.cache_A[index] if self.cache_A is not None else self.load_image(open_file(A_path), self.mode,
+                                                                                    self.load_size)
+            return {'A': to_uint8_tensor(A), 'A_paths': A_path}
+        if self.cache_A is not None:
+            A = array_to_tensor(self.opt, random_crop_flip(self.cache_A[index], self.opt), self.norm)
+        else:
+            A_img = self.load_image(open_file(A_path), self.mode, self.load_size)
+            A = self.transform(A_img)
         return {'A': A, 'A_paths': A_path}
 
+    # --io_threads, see UnalignedDataset.sample_files
+    def sample_files(self, index):
+        return index, [self.A_paths[index]]
+
+    # --decode_backend torchvision, see UnalignedDataset.get_batch
+    def get_batch(self, indices):
+        A_paths = [self.A_paths[index] for index in indices]
+        return {'A': read_files(A_paths), 'A_paths': A_paths}
+
+    def augment_batch(self, batch, device):
+        images = batch['A']
+        if self.opt.decode_backend == 'torchvision':
+            images = decode_batch(images, self.mode, device)
+        A = batch_transform.augment(images, self.opt, device, self.norm)
+        return {'A': A, 'A_paths': batch['A_paths']}
+
+    # (indices, sizes) for a BucketBatchSampler, only the image headers are read
+    def bucket_sizes(self):
+        sizes = [get_output_size(self.opt, Image.open(path).size) for path in self.A_paths]
+        return list(range(len(self.A_paths))), sizes
+
     def __len__(self):
         return len(self.A_paths)
 
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from data.image_folder import load_image
+
+
+# Per-modality channel statistics of an image folder, used by
+# --normalize dataset. Images are read once by a process pool, every worker
+# keeps running moments and 256 bin histograms per channel for its chunk and
+# the chunks are merged with the parallel Welford update, so memory does not
+# grow with the dataset. Results are cached in
+# <cache_dir>/stats_<name>_<fingerprint>.json, the fingerprint covers the
+# path, size and mtime of every file, so later runs do not read the images.
+
+STATS_VERSION = 1
+CHUNK_SIZE = 64
+
+
+class RunningStats():
+    def __init__(self, channels=3, bins=256):
+        self.count = 0
+        self.mean = np.zeros(channels)
+        self.m2 = np.zeros(channels)
+        self.histogram = np.zeros((channels, bins), dtype=np.int64)
+
+    def update(self, img):
+        # img: HxWxC uint8, moments of the image are taken from its histogram
+        pixels = img.reshape(-1, img.shape[-1])
+        values = np.arange(self.histogram.shape[1], dtype=np.float64)
+        histogram = np.stack([np.bincount(pixels[:, c], minlength=self.histogram.shape[1])
+                              for c in range(pixels.shape[1])])
+        count = pixels.shape[0]
+        mean = histogram.dot(values) / count
+        m2 = (histogram * (values[None, :] - mean[:, None]) ** 2).sum(axis=1)
+        self.histogram += histogram
+        self._merge(count, mean, m2)
+
+    def merge(self, other):
+        self.histogram += other.histogram
+        self._merge(other.count, other.mean, other.m2)
+
+    def _merge(self, count, mean, m2):
+        if count == 0:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def result(self):
+        # mean and std on the [0, 1] scale of ToTensor()
+        std = np.sqrt(self.m2 / max(1, self.count))
+        return {'mean': (self.mean / 255.0).tolist(),
+                'std': (std / 255.0).tolist(),
+                'pixels': int(self.count),
+                'histogram': self.histogram.tolist()}
+
+
+# Modalities stored in one image: None for a single one, 'vertical' for the
+# two halves stacked on top of each other (A of UnalignedDataset) and
+# 'horizontal' for side by side halves (AB of AlignedDataset).
+def split_image(img, split):
+    if split is None:
+        return [img]
+    elif split == 'vertical':
+        h = img.shape[0] // 2
+        return [img[:h], img[h:]]
+    elif split == 'horizontal':
+        w = img.shape[1] // 2
+        return [img[:, :w], img[:, w:]]
+    raise ValueError('unknown modality split [%s]' % split)
+
+
+def _chunk_stats(args):
+    paths, split, mode = args
+    stats = None
+    for path in paths:
+        img = np.asarray(load_image(path, mode))
+        if img.ndim == 2:
+            img = img[:, :, None]
+        parts = split_image(img, split)
+        if stats is None:
+            stats = [RunningStats(part.shape[-1]) for part in parts]
+        for s, part in zip(stats, parts):
+            s.update(part)
+    return stats
+
+
+def fingerprint(paths, split, mode):
+    sha1 = hashlib.sha1(json.dumps([STATS_VERSION, split, mode]).encode())
+    for path in paths:
+        st = os.stat(path)
+        sha1.update(('%s\0%d\0%d\n' % (path, st.st_size, st.st_mtime_ns)).encode())
+    return sha1.hexdigest()
+
+
+def compute_stats(paths, split=None, num_workers=1, mode='RGB'):
+    print('computing statistics of %d images' % len(paths))
+    jobs = [(paths[i:i + CHUNK_SIZE], split, mode) for i in range(0, len(paths), CHUNK_SIZE)]
+    pool = Pool(num_workers) if num_workers > 1 else None
+    results = pool.imap_unordered(_chunk_stats, jobs) if pool else map(_chunk_stats, jobs)
+    stats = None
+    for chunk in results:
+        if stats is None:
+            stats = chunk
+        else:
+            for s, other in zip(stats, chunk):
+                s.merge(other)
+    if pool:
+        pool.close()
+        pool.join()
+    return {'images': len(paths), 'split': split, 'modalities': [s.result() for s in stats or []]}
+
+
+def get_stats(cache_dir, name, paths, split=None, num_workers=1, mode='RGB'):
+    paths = list(paths)
+    stats_path = os.path.join(cache_dir, 'stats_%s_%s.json' % (name, fingerprint(paths, split, mode)[:16]))
+    if os.path.isfile(stats_path):
+        with open(stats_path) as f:
+            return json.load(f)
+    stats = compute_stats(paths, split, num_workers, mode)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    tmp_path = stats_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, stats_path)
+    return stats
@@ -1,88 +1,215 @@
 import os.path
 import torchvision.transforms as transforms
-from data.base_dataset import BaseDataset, get_transform
+from data.base_dataset import BaseDataset, get_resize_transform, get_crop_transform, get_load_size, get_output_size, \
+    get_index_cache_dir, get_decoded_cache, get_image_loader, get_image_mode, get_normalization, \
+    get_dataset_normalization, get_tensor_transform, prescan_dir, random_crop_flip, array_to_tensor, to_uint8_tensor, \
+    FIXED_NORMALIZATION
+from data import batch_transform
 from data.image_folder import make_dataset
+from data.jpeg_decoder import read_files, decode_batch
+from data.readahead import unwrap
 from PIL import Image
 import PIL
 import random
 import cv2
 import imageio
-import numpy as np
 import torch
 
 
 class UnalignedDataset(BaseDataset):
+    bucket_key = 'B'
+    decode_backends = ('pil', 'torchvision')
+
     def initialize(self, opt):
         self.opt = opt
         self.root = opt.dataroot
         self.dir_A = os.path.join(opt.dataroot, opt.phase + 'A')
         self.dir_B = os.path.join(opt.dataroot, opt.phase + 'B')
         self.no_input = opt.no_input
-        self.A_paths = make_dataset(self.dir_A)
-        self.B_paths = make_dataset(self.dir_B)
+        # the half of A that stack_modalities keeps
+        self.modality = 'visible' if self.no_input == 1 else 'lwir'
+        # --A_layout split: every modality of A is stored in its own
+        # [phase]A_<modality> folder under the same file name, only the one in
+        # use is read
+        self.split_A = opt.A_layout == 'split'
+        if self.split_A:
+            self.dir_A = os.path.join(opt.dataroot, opt.phase + 'A_' + self.modality)
+        prescan_dir(opt, self.dir_A)
+        prescan_dir(opt, self.dir_B)
+        self.A_paths = make_dataset(self.dir_A, get_index_cache_dir(opt), dedup=opt.dedup)
+        self.B_paths = make_dataset(self.dir_B, get_index_cache_dir(opt), dedup=opt.dedup)
 
         self.A_paths = sorted(self.A_paths)
         self.B_paths = sorted(self.B_paths)
         self.A_size = len(self.A_paths)
         self.B_size = len(self.B_paths)
-        self.transform = get_transform(opt)
+        # 1 channel (thermal) modalities are decoded as 'L' and stay 1 channel
+        self.mode_A = get_image_mode(opt.input_nc)
+        self.mode_B = get_image_mode(opt.output_nc)
+        self.normalization = get_dataset_normalization(opt, self.training_normalization)
+        self.norm_A, self.norm_B = self.normalization['A'], self.normalization['B']
+        # B is resized once per decode and cropped once per sample
+        self.resize_B = transforms.Compose(get_resize_transform(opt))
+        self.crop_B = transforms.Compose(get_crop_transform(opt, self.norm_B))
 
         osize = [opt.loadSize, opt.loadSize * self.opt.input_nc]
         opt.fineSize * self.no_input * self.opt.input_nc
-        self.transformA = []
-        self.transformA.append(transforms.Resize((opt.fineSize * 2, opt.fineSize), Image.BICUBIC))
-        self.transformA += [transforms.ToTensor(),
-                            transforms.Normalize((0.5, 0.5, 0.5),
-                                                 (0.5, 0.5, 0.5))]
-        # self.transformA.append(transforms.RandomCrop((opt.fineSize,opt.fineSize*self.opt.input_nc) ))
-        self.transformA = transforms.Compose(self.transformA)
+        # A is resized to (fineSize, fineSize * 2), or (fineSize, fineSize) for
+        # a single modality
+        size_A = (opt.fineSize, opt.fineSize) if self.split_A else (opt.fineSize, opt.fineSize * 2)
+        if self.split_A:
+            self.transformA = get_transform_modality(opt, self.norm_A)
+        else:
+            self.transformA = get_transform_A(opt, self.norm_A)
+        # JPEG draft sizes
+        self.load_size_A = None if opt.no_draft else size_A
+        self.load_size_B = get_load_size(opt)
+        self.load_image, self.shm_cache = get_image_loader(opt, [self.load_size_A, self.load_size_B])
+
+        self.cache_A = self.cache_B = None
+        if opt.decoded_cache:
+            self.cache_A = get_decoded_cache(opt, self.dir_A, self.A_paths, size_A, self.mode_A)
+            self.cache_B = get_decoded_cache(opt, self.dir_B, self.B_paths, (opt.loadSize, opt.loadSize),
+                                             self.mode_B)
+
+    def training_normalization(self):
+        opt = self.opt
+        if self.split_A:
+            norm_A = get_normalization(opt, os.path.join(opt.dataroot, 'trainA_' + self.modality),
+                                       mode=self.mode_A)[0]
+        else:
+            # only one half of A is used, A is normalized with its statistics
+            norm_A = get_normalization(opt, os.path.join(opt.dataroot, 'trainA'), 'vertical', self.mode_A)[
+                0 if self.no_input == 1 else 1]
+        norm_B = get_normalization(opt, os.path.join(opt.dataroot, 'trainB'), mode=self.mode_B)[0]
+        return {'A': norm_A, 'B': norm_B}
+
+    def pair(self, index):
+        if isinstance(index, tuple):
+            # (index_A, index_B) pair from a PairingSampler
+            return index
+        return index % self.A_size, random.randint(0, self.B_size - 1)
 
     def __getitem__(self, index):
-        A_path = self.A_paths[index % self.A_size]
-        index_A = index % self.A_size
-        index_B = random.randint(0, self.B_size - 1)
+        if isinstance(index, list):
+            return self.get_batch(index)
+        if not self.opt.batch_augment:
+            return self.get_crops(index, 1)[0]
+        index, open_file = unwrap(index)
+        index_A, index_B = self.pair(index)
+        A_path = self.A_paths[index_A]
         B_path = self.B_paths[index_B]
 
-        A_img = Image.open(A_path).convert('RGB') # A image is a no_input*3 collection of images
-        A_img = (self.transformA(A_img))
-        # I suppose this is for controlling the data size
-        if self.no_input == 1:
-            # Introducing a little redundancy to avoid changing the whole code
-            # In case of a single input, the image is not splitted into two but simply copied
-            # Also, given the dataset, 0:256 is RGB image while 256:512 is the IR image
-            # To test day2nightOrig, it is necessary to set A_img[0] as 1 in the floowing lines
-            A1 = A_img[:, 0:256, :]
-            A2 = A_img[:, 0:256, :]
+        # transforms are applied on the whole batch by augment_batch
+        A = self.cache_A[index_A] if self.cache_A is not None else self.load_image(open_file(A_path), self.mode_A,
+                                                                                    self.load_size_A)
+        B = self.cache_B[index_B] if self.cache_B is not None else self.load_image(open_file(B_path), self.mode_B,
+                                                                                    self.load_size_B)
+        return {'A': to_uint8_tensor(A), 'B': to_uint8_tensor(B), 'A_index': index_A,
+                'A_paths': A_path, 'B_paths': B_path}
+
+    # count samples sharing one decode of A and B (--crops_per_decode), with
+    # independent random crops/flips of B. A is only resized, it is shared.
+    def get_crops(self, index, count):
+        index, open_file = unwrap(index)
+        index_A, index_B = self.pair(index)
+        A_path = self.A_paths[index_A]
+        B_path = self.B_paths[index_B]
+
+        if self.cache_A is not None:
+            A_img = array_to_tensor(self.opt, self.cache_A[index_A], self.norm_A)
         else:
-            A1 = A_img[:, 256:512, :]
-            A2 = A_img[:, 256:512, :]
-
-        A1 = A1.unsqueeze(0).numpy()
-        A2 = A2.unsqueeze(0).numpy()
-        A1 = np.squeeze(A1, axis=0)
-        A2 = np.squeeze(A2, axis=0)
-        B_img = Image.open(B_path)  # .convert('RGB')
-        B = self.transform(B_img)
-        if self.opt.which_direction == 'BtoA':
-            input_nc = self.opt.output_nc
-            output_nc = self.opt.input_nc
+            A_img = self.load_image(open_file(A_path), self.mode_A, self.load_size_A) # A image is a no_input*3 collection of images
+            A_img = (self.transformA(A_img))
+        if self.split_A:
+            A = A_img.unsqueeze(0)
         else:
-            input_nc = self.opt.input_nc
-            output_nc = self.opt.output_nc
-
-        # For now only support RGB
-        # if input_nc == 1:  # RGB to gray
-        #    tmp = A[0, ...] * 0.299 + A[1, ...] * 0.587 + A[2, ...] * 0.114
-        #    A = tmp.unsqueeze(0)
-
-        # if output_nc == 1:  # RGB to gray
-        #    tmp = B[0, ...] * 0.299 + B[1, ...] * 0.587 + B[2, ...] * 0.114
-        #    B = tmp.unsqueeze(0)
-        return {'A1': A1, 'A2': A2, 'B': B,
-                'A_paths': A_path, 'B_paths': B_path}
+            A = stack_modalities(A_img, self.no_input)
+        if self.cache_B is not None:
+            B_img = self.cache_B[index_B]
+            crop_B = lambda: array_to_tensor(self.opt, random_crop_flip(B_img, self.opt), self.norm_B)
+        else:
+            # 3 channel B keeps the mode of the file
+            B_img = self.load_image(open_file(B_path), 'L' if self.mode_B == 'L' else None, self.load_size_B)  # .convert('RGB')
+            B_img = self.resize_B(B_img)
+            crop_B = lambda: self.crop_B(B_img)
+
+        # input_nc == 1 / output_nc == 1 modalities were decoded as 'L', A and
+        # B already have the number of channels of the networks
+        return [{'A': A, 'B': crop_B(), 'A_index': index_A,
+                 'A_paths': A_path, 'B_paths': B_path} for _ in range(count)]
+
+    # --io_threads: the pair drawn for index and the files it reads
+    def sample_files(self, index):
+        index_A, index_B = self.pair(index)
+        return (index_A, index_B), [self.A_paths[index_A], self.B_paths[index_B]]
+
+    # --decode_backend torchvision: the files of a whole batch are read in one
+    # call and returned undecoded, augment_batch decodes them
+    def get_batch(self, indices):
+        pairs = [self.pair(index) for index in indices]
+        A_paths = [self.A_paths[index_A] for index_A, _ in pairs]
+        B_paths = [self.B_paths[index_B] for _, index_B in pairs]
+        data = read_files(A_paths + B_paths)
+        return {'A': data[:len(pairs)], 'B': data[len(pairs):],
+                'A_index': torch.tensor([index_A for index_A, _ in pairs]),
+                'A_paths': A_paths, 'B_paths': B_paths}
+
+    def augment_batch(self, batch, device):
+        if self.opt.decode_backend == 'torchvision':
+            batch = dict(batch, A=decode_batch(batch['A'], self.mode_A, device),
+                         B=decode_batch(batch['B'], self.mode_B, device))
+        A = batch_transform.to_device(batch['A'], device)
+        if self.split_A:
+            A = batch_transform.normalize(batch_transform.resize(A, (self.opt.fineSize, self.opt.fineSize)), self.norm_A)
+            A = A.unsqueeze(1)
+        else:
+            A = batch_transform.normalize(batch_transform.resize(A, (self.opt.fineSize * 2, self.opt.fineSize)),
+                                          self.norm_A)
+            A = stack_modalities(A, self.no_input)
+        B = batch_transform.augment(batch['B'], self.opt, device, self.norm_B)
+        return {'A': A, 'B': B, 'A_index': batch['A_index'],
+                'A_paths': batch['A_paths'], 'B_paths': batch['B_paths']}
+
+    # (indices, sizes) for a BucketBatchSampler. A always has the same size,
+    # so samples are bucketed by B, which is paired deterministically.
+    def bucket_sizes(self):
+        indices = [(index % self.A_size, index % self.B_size) for index in range(len(self))]
+        B_sizes = [get_output_size(self.opt, Image.open(path).size) for path in self.B_paths]
+        return indices, [B_sizes[index_B] for _, index_B in indices]
 
     def __len__(self):
         return max(self.A_size, self.B_size)
 
     def name(self):
         return 'UnalignedDataset'
+
+
+# A images are the modalities stacked vertically, they are only resized
+def get_transform_A(opt, normalization=FIXED_NORMALIZATION):
+    transformA = []
+    transformA.append(transforms.Resize((opt.fineSize * 2, opt.fineSize), Image.BICUBIC))
+    transformA += get_tensor_transform(opt, normalization)
+    # transformA.append(transforms.RandomCrop((opt.fineSize,opt.fineSize*opt.input_nc) ))
+    return transforms.Compose(transformA)
+
+
+# A images holding a single modality, resized as one half of the stacked A
+def get_transform_modality(opt, normalization=FIXED_NORMALIZATION):
+    return transforms.Compose([transforms.Resize((opt.fineSize, opt.fineSize), Image.BICUBIC)] +
+                              get_tensor_transform(opt, normalization))
+
+
+# The modalities of the stacked A image (CxHxW, or a NxCxHxW batch) fed to
+# the model, as one [M, C, H, W] tensor ([N, M, C, H, W] for a batch).
+# CycleGANModel takes A1 and A2 as views of its first and last modality.
+def stack_modalities(A_img, no_input):
+    # I suppose this is for controlling the data size
+    if no_input == 1:
+        # In case of a single input, the image is not splitted into two, A1 and A2 are the same modality
+        # Also, given the dataset, 0:256 is RGB image while 256:512 is the IR image
+        # To test day2nightOrig, it is necessary to set A_img[0] as 1 in the floowing lines
+        A = A_img[..., 0:256, :]
+    else:
+        A = A_img[..., 256:512, :]
+    return A.unsqueeze(-4)
@@ -0,0 +1,43 @@
+# Channel mean/std and histograms of every modality of the training folders,
+# as used by --normalize dataset. Takes the same options as train.py, e.g.
+#   python dataset_stats.py --dataroot ./datasets/Day2Night --output stats.json
+# The statistics are cached in cache_dir, train.py/test.py with
+# --normalize dataset compute missing ones as well.
+import json
+import os
+from options.train_options import TrainOptions
+from data.base_dataset import get_cache_dir, get_index_cache_dir, get_image_mode
+from data.image_folder import make_dataset
+from data.statistics import get_stats
+
+options = TrainOptions()
+options.initialize()
+options.parser.add_argument('--output', type=str, default='', help='also write the statistics here as JSON')
+opt = options.parser.parse_args()
+
+# images are read in the mode the datasets decode them in
+mode_A, mode_B = get_image_mode(opt.input_nc), get_image_mode(opt.output_nc)
+if opt.dataset_mode == 'aligned':
+    folders = [('train', 'horizontal', get_image_mode(max(opt.input_nc, opt.output_nc)))]
+elif opt.dataset_mode == 'single':
+    folders = [('', None, mode_B if opt.which_direction == 'BtoA' else mode_A)]
+elif opt.A_layout == 'split':
+    folders = [('trainA_visible', None, mode_A), ('trainA_lwir', None, mode_A), ('trainB', None, mode_B)]
+else:
+    folders = [('trainA', 'vertical', mode_A), ('trainB', None, mode_B)]
+
+report = {}
+for folder, split, mode in folders:
+    dir = os.path.join(opt.dataroot, folder)
+    paths = sorted(make_dataset(dir, get_index_cache_dir(opt)))
+    stats = get_stats(get_cache_dir(opt), os.path.basename(os.path.normpath(dir)), paths, split,
+                      num_workers=max(1, opt.nThreads), mode=mode)
+    report[folder or opt.dataroot] = stats
+    for i, modality in enumerate(stats['modalities']):
+        print('%s modality %d: mean %s std %s' % (folder or opt.dataroot, i,
+                                                  ', '.join('%.4f' % v for v in modality['mean']),
+                                                  ', '.join('%.4f' % v for v in modality['std'])))
+
+if opt.output:
+    with open(opt.output, 'w') as f:
+        json.dump(report, f)
@@ -0,0 +1,66 @@
+# Near-duplicate frame deduplication of the dataset folders, e.g.
+#   python dedup_dataset.py --dataroot ./datasets/Day2Night --dedup_radius 4 --nThreads 16
+# Takes the same options as train.py. Every image of the folders train.py
+# reads is hashed (in parallel, cached in cache_dir), near-duplicate frames
+# are clustered and [folder]/dedup.json lists the one image kept per
+# cluster, which --dedup then uses. The test images with a near-duplicate in
+# the training folders are flagged: the [dataroot]/test* counterparts of the
+# training folders and --test_dirs, e.g. the test_images/testA and testB
+# written by random_test_images.select_images.
+import json
+import os
+
+from options.train_options import TrainOptions
+from data.base_dataset import get_cache_dir, get_dataset_dirs
+from data.dedup import get_hashes, cluster, write_dedup, find_overlap
+
+
+def main():
+    options = TrainOptions()
+    options.initialize()
+    parser = options.parser
+    parser.add_argument('--dedup_radius', type=int, default=4,
+                        help='images whose 64 bit hashes differ in at most this many bits are near-duplicates')
+    parser.add_argument('--test_dirs', type=str, default='',
+                        help='comma separated test folders checked for overlap, besides the test counterparts of the training folders')
+    parser.add_argument('--overlap_report', type=str, default='',
+                        help='write the (test image, train image, distance) overlaps here as JSON')
+    opt = parser.parse_args()
+    opt.isTrain = True
+    cache_dir = get_cache_dir(opt)
+    num_workers = max(1, opt.nThreads)
+
+    train_dirs = get_dataset_dirs(opt)
+    kept = total = 0
+    train_hashes = {}
+    for dir in train_dirs:
+        hashes = get_hashes(dir, cache_dir, num_workers)
+        clusters = cluster(hashes, opt.dedup_radius)
+        write_dedup(dir, clusters, opt.dedup_radius)
+        print('%s: %d images, %d kept' % (dir, len(hashes), len(clusters)))
+        kept += len(clusters)
+        total += len(hashes)
+        train_hashes.update(hashes)
+    print('%d of %d images kept' % (kept, total))
+
+    test_dirs = [dir for dir in opt.test_dirs.split(',') if dir]
+    if opt.dataset_mode != 'single':
+        test_opt = type(opt)(**vars(opt))
+        test_opt.phase = 'test'
+        test_dirs += [dir for dir in get_dataset_dirs(test_opt) if os.path.isdir(dir) and dir not in train_dirs]
+    overlaps = []
+    for dir in test_dirs:
+        overlap = find_overlap(train_hashes, get_hashes(dir, cache_dir, num_workers), opt.dedup_radius)
+        print('%s: %d images with a near-duplicate in %s' % (dir, len(overlap), ', '.join(train_dirs)))
+        for test_path, train_path, distance in overlap:
+            print('    %s ~ %s (%d bits)' % (test_path, train_path, distance))
+        overlaps += overlap
+
+    if opt.overlap_report:
+        with open(opt.overlap_report, 'w') as f:
+            json.dump([{'test': test_path, 'train': train_path, 'distance': distance}
+                       for test_path, train_path, distance in overlaps], f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
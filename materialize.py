@@ -0,0 +1,12 @@
+# One-time materialization of the decoded cache used by --decoded_cache.
+# Takes the same options as train.py/test.py, e.g.
+#   python materialize.py --dataroot ./datasets/Day2Night --fineSize 256 --loadSize 286
+# Running train.py with --decoded_cache builds a missing or stale cache as
+# well, this script only lets it happen ahead of time.
+from options.train_options import TrainOptions
+from data.custom_dataset_data_loader import CreateDataset
+
+opt = TrainOptions().parse()
+opt.decoded_cache = True
+dataset = CreateDataset(opt)
+print('decoded cache ready for %d samples' % len(dataset))
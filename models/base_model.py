@@ -1,5 +1,7 @@
 import os
 import torch
+from data.batch_transform import normalize
+from data.base_dataset import FIXED_NORMALIZATION
 
 
 class BaseModel():
@@ -16,6 +18,31 @@ class BaseModel():
     def set_input(self, input):
         self.input = input
 
+    # Batches that the loader already put on the model device (--prefetch,
+    # --batch_augment) are used as they are, others are copied into the
+    # preallocated buffer.
+    def assign_input(self, buffer, input, normalization=None):
+        if input.dtype == torch.uint8:
+            # --uint8_transport: one conversion and normalization per batch
+            input = input.to(buffer.device, non_blocking=True).float()
+            return normalize(input, normalization or FIXED_NORMALIZATION)
+        if input.device == buffer.device and input.dtype == buffer.dtype:
+            return input
+        return buffer.resize_(input.size()).copy_(input)
+
+    # (mean, std) the images of domain key ('A' or 'B') of the current batch
+    # were normalized with, for util.tensor2im. None for the fixed [-1, 1]
+    def get_normalization(self, key):
+        input = getattr(self, 'input', None)
+        return input.get('normalization', {}).get(key) if isinstance(input, dict) else None
+
+    # (height, width) of every image of a bucketed batch before padding, or
+    # None for the whole batch when the batch is not padded
+    def get_input_size(self, index):
+        input = getattr(self, 'input', None)
+        sizes = input.get('sizes') if isinstance(input, dict) else None
+        return None if sizes is None else sizes[index]
+
     def forward(self):
         pass
 
@@ -35,6 +62,10 @@ class BaseModel():
     def get_current_errors(self):
         return {}
 
+    # per sample losses of the last optimization step, for --loss_sampling
+    def get_sample_losses(self):
+        return None
+
     def save(self, label):
         pass
 
@@ -22,11 +22,10 @@ class CycleGANModel(BaseModel):
         nb = opt.batchSize
         size = opt.fineSize
         self.no_input = opt.no_input
-        self.input_A1 = self.Tensor(nb, opt.input_nc, size, size)  # store inputs in a tensor # DONE
-        # TODO: maybe little error here (opt.input_nc2 instead of opt.input_nc?)
-        self.input_A2 = self.Tensor(nb, opt.input_nc2, size, size)  # store inputs in a tensor # DONE
+        # the modalities of A stacked, [N, M, C, H, W]
+        self.input_A = self.Tensor(nb, 1, opt.input_nc, size, size)  # store inputs in a tensor # DONE
         self.input_B = self.Tensor(nb, opt.output_nc, size, size)
-        print('initialize: A1: {x}, A2: {y}'.format(x=self.input_A1.shape, y=self.input_A2.shape))
+        print('initialize: A: {x}'.format(x=self.input_A.shape))
 
         # load/define networks
         # The naming conversion is different from those used in the paper
@@ -100,12 +99,15 @@ class CycleGANModel(BaseModel):
 
     def set_input(self, input):
         AtoB = self.opt.which_direction == 'AtoB'
-        input_A1 = input['A1']
-        input_A2 = input['A2']
+        input_A = input['A']
         input_B = input['B']
-        self.input_A1.resize_(input_A1.size()).copy_(input_A1)
-        self.input_A2.resize_(input_A2.size()).copy_(input_A2)
-        self.input_B.resize_(input_B.size()).copy_(input_B)
+        self.input = input
+        normalization = input.get('normalization', {})
+        self.input_A = self.assign_input(self.input_A, input_A, normalization.get('A'))
+        # views, A1 and A2 are the first and last modality
+        self.input_A1 = self.input_A[:, 0]
+        self.input_A2 = self.input_A[:, -1]
+        self.input_B = self.assign_input(self.input_B, input_B, normalization.get('B'))
         self.image_paths = input['A_paths' if AtoB else 'B_paths']
 
     def forward(self):
@@ -190,6 +192,11 @@ class CycleGANModel(BaseModel):
 
         self.rec_B, latent_rB = self.netG_A.forward(self.fake_A1, self.fake_A2)
         self.loss_cycle_B = self.criterionCycle(self.rec_B, self.real_B) * lambda_B
+        if self.opt.loss_sampling:
+            # loss_cycle_A of every sample, it only depends on the A image
+            with torch.no_grad():
+                self.sample_loss_A = ((self.rec_A1 - self.real_A1).abs().flatten(1).mean(1) +
+                                      (self.rec_A2 - self.real_A2).abs().flatten(1).mean(1)) * lambda_A
         self.latent_loss = lambda_latent * self.l1_loss(latent_fB, latent_rA) + lambda_latent * self.l1_loss(latent_fA,
                                                                                                              latent_rB)
 
@@ -212,6 +219,9 @@ class CycleGANModel(BaseModel):
         self.backward_D_B()
         self.optimizer_D_B.step()
 
+    def get_sample_losses(self):
+        return getattr(self, 'sample_loss_A', None)
+
     def get_current_errors(self):
         D_A = self.loss_D_A.item()
         G_A = self.loss_G_A.item()
@@ -228,19 +238,23 @@ class CycleGANModel(BaseModel):
             return OrderedDict([('D_A', D_A), ('G_A', G_A), ('Cyc_A', Cyc_A),
                                 ('D_B', D_B), ('G_B', G_B), ('Cyc_B', Cyc_B)])
 
-    def get_current_visuals(self):
-        real_A1 = util.tensor2im(self.real_A1.data)
-        real_A2 = util.tensor2im(self.real_A2.data)
-        fake_B = util.tensor2im(self.fake_B.data)
-        rec_A1 = util.tensor2im(self.rec_A1.data)
-        rec_A2 = util.tensor2im(self.rec_A2.data)
-        real_B = util.tensor2im(self.real_B.data)
-        fake_A1 = util.tensor2im(self.fake_A1.data)
-        fake_A2 = util.tensor2im(self.fake_A2.data)
-        rec_B = util.tensor2im(self.rec_B.data)
+    def get_current_visuals(self, index=0):
+        # bucketed batches are padded on B, the images coming from B are cropped back
+        size_B = self.get_input_size(index)
+        # generated images are shown with the normalization of their domain
+        norm_A, norm_B = self.get_normalization('A'), self.get_normalization('B')
+        real_A1 = util.tensor2im(self.real_A1.data, index=index, normalization=norm_A)
+        real_A2 = util.tensor2im(self.real_A2.data, index=index, normalization=norm_A)
+        fake_B = util.tensor2im(self.fake_B.data, index=index, normalization=norm_B)
+        rec_A1 = util.tensor2im(self.rec_A1.data, index=index, normalization=norm_A)
+        rec_A2 = util.tensor2im(self.rec_A2.data, index=index, normalization=norm_A)
+        real_B = util.tensor2im(self.real_B.data, index=index, size=size_B, normalization=norm_B)
+        fake_A1 = util.tensor2im(self.fake_A1.data, index=index, size=size_B, normalization=norm_A)
+        fake_A2 = util.tensor2im(self.fake_A2.data, index=index, size=size_B, normalization=norm_A)
+        rec_B = util.tensor2im(self.rec_B.data, index=index, size=size_B, normalization=norm_B)
         if self.opt.identity > 0.0:
-            idt_A = util.tensor2im(self.idt_A.data)
-            idt_B = util.tensor2im(self.idt_B.data)
+            idt_A = util.tensor2im(self.idt_A.data, normalization=norm_B)
+            idt_B = util.tensor2im(self.idt_B.data, normalization=norm_A)
             return OrderedDict([('real_A', real_A), ('fake_B', fake_B), ('rec_A', rec_A), ('idt_B', idt_B),
                                 ('real_B', real_B), ('fake_A', fake_A), ('rec_B', rec_B), ('idt_A', idt_A)])
         else:
@@ -2,7 +2,7 @@ def create_model(opt):
     model = None
     print('Model: {x}'.format(x=opt.model))
     if opt.model == 'cycle_gan':
-        assert (opt.dataset_mode == 'unaligned')
+        assert (opt.dataset_mode in ('unaligned', 'sharded', 'kaist'))
         from .cycle_gan_model import CycleGANModel
         model = CycleGANModel()
     elif opt.model == 'pix2pix':
@@ -143,6 +143,17 @@ def define_G(input_nc, output_nc, ngf, which_model_netG, norm='batch', use_dropo
     return netG
 
 
+# total stride of a generator, its inputs must be a multiple of it
+def get_downsampling_factor(which_model_netG):
+    if which_model_netG.startswith('resnet'):
+        return 4
+    elif which_model_netG == 'unet_128':
+        return 2 ** 7
+    elif which_model_netG in ('unet_256', 'unetMM'):
+        return 2 ** 8
+    raise NotImplementedError('Generator model name [%s] is not recognized' % which_model_netG)
+
+
 def define_D(input_nc, ndf, which_model_netD,
              n_layers_D=3, norm='batch', use_sigmoid=False, init_type='normal', gpu_ids=[]):
     netD = None
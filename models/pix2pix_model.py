@@ -64,8 +64,10 @@ class Pix2PixModel(BaseModel):
         AtoB = self.opt.which_direction == 'AtoB'
         input_A = input['A' if AtoB else 'B']
         input_B = input['B' if AtoB else 'A']
-        self.input_A.resize_(input_A.size()).copy_(input_A)
-        self.input_B.resize_(input_B.size()).copy_(input_B)
+        self.input = input
+        normalization = input.get('normalization', {})
+        self.input_A = self.assign_input(self.input_A, input_A, normalization.get('A' if AtoB else 'B'))
+        self.input_B = self.assign_input(self.input_B, input_B, normalization.get('B' if AtoB else 'A'))
         self.image_paths = input['A_paths' if AtoB else 'B_paths']
 
     def forward(self):
@@ -131,10 +133,12 @@ class Pix2PixModel(BaseModel):
                             ('D_fake', self.loss_D_fake.data[0])
                             ])
 
-    def get_current_visuals(self):
-        real_A = util.tensor2im(self.real_A.data)
-        fake_B = util.tensor2im(self.fake_B.data)
-        real_B = util.tensor2im(self.real_B.data)
+    def get_current_visuals(self, index=0):
+        AtoB = self.opt.which_direction == 'AtoB'
+        norm_A, norm_B = self.get_normalization('A' if AtoB else 'B'), self.get_normalization('B' if AtoB else 'A')
+        real_A = util.tensor2im(self.real_A.data, index=index, normalization=norm_A)
+        fake_B = util.tensor2im(self.fake_B.data, index=index, normalization=norm_B)
+        real_B = util.tensor2im(self.real_B.data, index=index, normalization=norm_B)
         return OrderedDict([('real_A', real_A), ('fake_B', fake_B), ('real_B', real_B)])
 
     def save(self, label):
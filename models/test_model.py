@@ -29,7 +29,8 @@ class TestModel(BaseModel):
     def set_input(self, input):
         # we need to use single_dataset mode
         input_A = input['A']
-        self.input_A.resize_(input_A.size()).copy_(input_A)
+        self.input = input
+        self.input_A = self.assign_input(self.input_A, input_A, input.get('normalization', {}).get('A'))
         self.image_paths = input['A_paths']
 
     def test(self):
@@ -40,7 +41,8 @@ class TestModel(BaseModel):
     def get_image_paths(self):
         return self.image_paths
 
-    def get_current_visuals(self):
-        real_A = util.tensor2im(self.real_A.data)
-        fake_B = util.tensor2im(self.fake_B.data)
+    def get_current_visuals(self, index=0):
+        size = self.get_input_size(index)
+        real_A = util.tensor2im(self.real_A.data, index=index, size=size, normalization=self.get_normalization('A'))
+        fake_B = util.tensor2im(self.fake_B.data, index=index, size=size, normalization=self.get_normalization('B'))
         return OrderedDict([('real_A', real_A), ('fake_B', fake_B)])
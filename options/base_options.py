@@ -16,7 +16,7 @@ class BaseOptions():
         self.parser.add_argument('--loadSize', type=int, default=286, help='scale images to this size')
         self.parser.add_argument('--fineSize', type=int, default=256, help='then crop to this size')
         self.parser.add_argument('--input_nc', type=int, default=3, help='# of input image channels')
-        self.parser.add_argument('--input_nc2', type=int, default=3, help='# of input2 image channels')
+        self.parser.add_argument('--input_nc2', type=int, default=3, help='unused (A is one stacked tensor), kept for existing scripts')
         self.parser.add_argument('--output_nc', type=int, default=3, help='# of output image channels')
         self.parser.add_argument('--ngf', type=int, default=64, help='# of gen filters in first conv layer')
         self.parser.add_argument('--ndf', type=int, default=64, help='# of discrim filters in first conv layer')
@@ -28,7 +28,9 @@ class BaseOptions():
         self.parser.add_argument('--name', type=str, default='experiment_name',
                                  help='name of the experiment. It decides where to store samples and models')
         self.parser.add_argument('--dataset_mode', type=str, default='unaligned',
-                                 help='chooses how datasets are loaded. [unaligned | aligned | single]')
+                                 help='chooses how datasets are loaded. [unaligned | aligned | single | sharded | kaist]')
+        self.parser.add_argument('--A_layout', type=str, default='stacked',
+                                 help='unaligned A samples: stacked, the modalities stacked vertically in [phase]A, or split, one [phase]A_visible / [phase]A_lwir folder per modality of which only the one in use is read')
         self.parser.add_argument('--no_input', type=int, default=1,
                                  help='number of modalities')
         self.parser.add_argument('--model', type=str, default='cycle_gan',
@@ -49,9 +51,53 @@ class BaseOptions():
         self.parser.add_argument('--max_dataset_size', type=int, default=float("inf"),
                                  help='Maximum number of samples allowed per dataset. If the dataset directory contains more than max_dataset_size, only a subset is loaded.')
         self.parser.add_argument('--resize_or_crop', type=str, default='resize_and_crop',
-                                 help='scaling and cropping of images at load time [resize_and_crop|crop|scale_width|scale_width_and_crop]')
+                                 help='scaling and cropping of images at load time [resize_and_crop|crop|scale_width|scale_width_and_crop|none]')
         self.parser.add_argument('--no_flip', action='store_true',
                                  help='if specified, do not flip the images for data augmentation')
+        self.parser.add_argument('--normalize', type=str, default='fixed',
+                                 help='fixed: normalize with mean = std = 0.5, dataset: center on the per modality channel mean of the training folders and scale by 2 std, clamped to [-1, 1]. Computed once and kept in cache_dir')
+        self.parser.add_argument('--no_draft', action='store_true',
+                                 help='if specified, always decode JPEGs at full resolution instead of DCT-domain downscaling to the load size')
+        self.parser.add_argument('--shm_cache', type=int, default=0,
+                                 help='MB of shared memory keeping decoded images for all the loader workers, least recently used first out. 0 disables it')
+        self.parser.add_argument('--decoded_cache', action='store_true',
+                                 help='decode and resize every image once into a memory-mapped cache, only random crop/flip is done at load time')
+        self.parser.add_argument('--shard_dir', type=str, default='',
+                                 help='where write_shards.py stored the tar shards for dataset_mode sharded. Defaults to [dataroot]/shards')
+        self.parser.add_argument('--shuffle_buffer', type=int, default=1000,
+                                 help='number of samples kept in memory to shuffle the sharded stream')
+        self.parser.add_argument('--uint8_transport', action='store_true',
+                                 help='loader workers return uint8 images, the model converts and normalizes the whole batch in set_input')
+        self.parser.add_argument('--batch_augment', action='store_true',
+                                 help='loader workers only decode, resize/crop/flip/normalize run on the whole batch on the model device')
+        self.parser.add_argument('--decode_backend', type=str, default='pil',
+                                 help='pil: every loader worker decodes its samples with PIL. torchvision: with --batch_augment, workers read the files of a whole batch and it is decoded at once by torchvision.io.decode_jpeg on the model device (PIL for other formats)')
+        self.parser.add_argument('--prescan', action='store_true',
+                                 help='check every image when the dataset is created, broken ones are quarantined and skipped. Results are cached in cache_dir')
+        self.parser.add_argument('--dedup', action='store_true',
+                                 help='only use the images dedup_dataset.py kept in [folder]/dedup.json, one per cluster of near-duplicate frames')
+        self.parser.add_argument('--no_index_cache', action='store_true',
+                                 help='if specified, always walk the image folders instead of using the file index kept in cache_dir')
+        self.parser.add_argument('--prefetch', type=int, default=0,
+                                 help='# of batches staged ahead on the model device from pinned memory, with persistent workers. 0 disables it')
+        self.parser.add_argument('--seed', type=int, default=-1,
+                                 help='if >= 0, unaligned A/B pairs are drawn by a sampler seeded with it and the epoch number. -1 keeps the per worker random pairing')
+        self.parser.add_argument('--rank', type=int, default=0, help='index of this process when the epoch is split with --seed')
+        self.parser.add_argument('--world_size', type=int, default=1, help='# of processes the epoch is split over with --seed')
+        self.parser.add_argument('--kaist_root', type=str, default='',
+                                 help='KAIST root (setXX/VXXX/{visible,lwir}) for dataset_mode kaist. Defaults to dataroot')
+        self.parser.add_argument('--day_sets', type=str, default='set00,set08',
+                                 help='comma separated KAIST sets used as A by dataset_mode kaist')
+        self.parser.add_argument('--night_sets', type=str, default='set05,set09',
+                                 help='comma separated KAIST sets used as B by dataset_mode kaist')
+        self.parser.add_argument('--frame_stride', type=int, default=1,
+                                 help='dataset_mode kaist only keeps one frame every frame_stride')
+        self.parser.add_argument('--readahead', type=int, default=16,
+                                 help='# of frames read ahead of the decoder by dataset_mode kaist, # of samples read ahead with --io_threads')
+        self.parser.add_argument('--io_threads', type=int, default=0,
+                                 help='# of threads reading the files of the next --readahead samples before the loader workers decode them (aligned, unaligned, single). 0 disables it')
+        self.parser.add_argument('--cache_dir', type=str, default='',
+                                 help='where dataset caches are stored. Defaults to [dataroot]/.cache')
         self.parser.add_argument('--identity', type=float, default=0.0,
                                  help='use identity mapping. Setting identity other than 1 has an effect of scaling the weight of the identity mapping loss. For example, if the weight of the identity loss should be 10 times smaller than the weight of the reconstruction loss, please set optidentity = 0.1')
         self.parser.add_argument('--init_type', type=str, default='xavier',
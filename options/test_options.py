@@ -10,6 +10,10 @@ class TestOptions(BaseOptions):
         self.parser.add_argument('--phase', type=str, default='test', help='train, val, test, etc')
         self.parser.add_argument('--which_epoch', type=str, default='latest',
                                  help='which epoch to load? set to latest to use latest cached model')
+        self.parser.add_argument('--bucketed', action='store_true',
+                                 help='batch test images of the same padded size together (with batchSize/nThreads) instead of one at a time, outputs are cropped back')
+        self.parser.add_argument('--bucket_multiple', type=int, default=0,
+                                 help='bucket sizes are padded to a multiple of this. 0 uses the downsampling factor of the generator')
         self.parser.add_argument('--how_many', type=int, default=50, help='how many test images to run')
         # self.parser.add_argument('--identity', type=float, default=0.0, help='use identity mapping. Setting identity other than 1 has an effect of scaling the weight of the identity mapping loss. For example, if the weight of the identity loss should be 10 times smaller than the weight of the reconstruction loss, please set optidentity = 0.1')
         self.isTrain = False
@@ -16,6 +16,22 @@ class TrainOptions(BaseOptions):
                                  help='continue training: load the latest model')
         self.parser.add_argument('--epoch_count', type=int, default=1,
                                  help='the starting epoch count, we save the model by <epoch_count>, <epoch_count>+<save_latest_freq>, ...')
+        self.parser.add_argument('--resume_iter', type=int, default=0,
+                                 help='with --seed, # of samples of epoch_count already done by this rank, they are skipped')
+        self.parser.add_argument('--loss_sampling', action='store_true',
+                                 help='draw unaligned A samples with a probability growing with their recent cycle loss')
+        self.parser.add_argument('--loss_temperature', type=float, default=1.0,
+                                 help='--loss_sampling draws A with probability ~ loss ** (1 / loss_temperature), higher is closer to uniform')
+        self.parser.add_argument('--loss_floor', type=float, default=0.1,
+                                 help='--loss_sampling keeps every A sample at least at loss_floor times its uniform probability')
+        self.parser.add_argument('--crops_per_decode', type=int, default=1,
+                                 help='# of samples with independent random crops/flips drawn from every decoded image (aligned, unaligned)')
+        self.parser.add_argument('--echo', type=int, default=1,
+                                 help='if > 1, every loaded batch is trained on up to echo times (with a new random flip/shift) while the trainer would otherwise wait for the loader. The factor adapts to the measured wait')
+        self.parser.add_argument('--echo_shift', type=int, default=8,
+                                 help='max # of pixels echoed batches are shifted by')
+        self.parser.add_argument('--crop_buffer', type=int, default=256,
+                                 help='# of samples mixed in memory with --crops_per_decode, so that crops of one image do not end up in the same batch')
         self.parser.add_argument('--phase', type=str, default='train', help='train, val, test, etc')
         self.parser.add_argument('--which_epoch', type=str, default='latest',
                                  help='which epoch to load? set to latest to use latest cached model')
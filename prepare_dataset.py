@@ -0,0 +1,177 @@
+# Converts the raw KAIST / NIR scene data into the training layout.
+#   python prepare_dataset.py day   --kaist_root /path/to/KAIST --dataroot datasets/Day2Night
+#   python prepare_dataset.py night --kaist_root /path/to/KAIST --dataroot datasets/Day2Night
+#   python prepare_dataset.py nir   --nir_root /path/to/nirscene --dataroot datasets/NIRtoVIS
+# day:   visible stacked on top of lwir, one image per frame of the day sets -> [phase]A
+#        with --layout split visible -> [phase]A_visible and lwir -> [phase]A_lwir
+#        under the same name instead, for --A_layout split
+# night: visible frames of the night sets -> [phase]B
+# nir:   nir and the green channel of rgb side by side -> [phase]A, rgb -> [phase]B
+# Frames are converted by a process pool. The journal records the sources,
+# size and quality of every output; outputs recorded with the same size and
+# quality, and with unchanged or older sources, are skipped, so an
+# interrupted run resumes where it stopped.
+import argparse
+import glob
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+from data.kaist import kaist_sequences, kaist_frames, paired_frames, sample_name
+
+JOURNAL = '.prepare_journal.jsonl'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('source', choices=['day', 'night', 'nir'], help='which data to convert')
+    parser.add_argument('--dataroot', required=True, help='destination, images go to [dataroot]/[phase]A and [phase]B')
+    parser.add_argument('--phase', type=str, default='train', help='train, val, test, etc')
+    parser.add_argument('--kaist_root', type=str, default='', help='KAIST root with setXX/VXXX/{visible,lwir}')
+    parser.add_argument('--nir_root', type=str, default='', help='folder with the *nir.tiff / *rgb.tiff scenes')
+    parser.add_argument('--day_sets', type=str, default='set00,set08', help='comma separated KAIST day sets')
+    parser.add_argument('--night_sets', type=str, default='set05,set09', help='comma separated KAIST night sets')
+    parser.add_argument('--width', type=int, default=0, help='resize every modality to this width, 0 keeps the original')
+    parser.add_argument('--height', type=int, default=0, help='resize every modality to this height, 0 keeps the original')
+    parser.add_argument('--quality', type=int, default=95, help='JPEG quality of the outputs')
+    parser.add_argument('--nThreads', type=int, default=os.cpu_count() or 1, help='# of conversion processes')
+    parser.add_argument('--layout', type=str, default='stacked', choices=['stacked', 'split'],
+                        help='day only: stacked, visible on top of lwir in one image, or split, one folder per modality')
+    parser.add_argument('--format', type=str, default='folder', choices=['folder', 'shards'],
+                        help='folder: loose images in [phase]A/[phase]B, shards: also pack them with write_shards')
+    parser.add_argument('--shard_size', type=int, default=1000, help='# of samples per shard for --format shards')
+    opt = parser.parse_args(argv)
+    if opt.format == 'shards' and opt.layout == 'split':
+        # ShardedDataset reads [phase]A/[phase]B shards only
+        parser.error('--format shards needs --layout stacked')
+    return opt
+
+
+def day_jobs(opt):
+    jobs = []
+    dest = os.path.join(opt.dataroot, opt.phase + 'A')
+    for sequence in kaist_sequences(opt.kaist_root, opt.day_sets.split(',')):
+        for frame, sources in paired_frames(sequence, ['visible', 'lwir']):
+            name = sample_name(sequence, frame)
+            if opt.layout == 'split':
+                # only frames with both modalities, as for stacked
+                jobs.append(('copy', sources[:1], os.path.join(dest + '_visible', name)))
+                jobs.append(('copy', sources[1:], os.path.join(dest + '_lwir', name)))
+            else:
+                jobs.append(('stack_v', sources, os.path.join(dest, name)))
+    return jobs
+
+
+def night_jobs(opt):
+    jobs = []
+    dest = os.path.join(opt.dataroot, opt.phase + 'B')
+    for sequence in kaist_sequences(opt.kaist_root, opt.night_sets.split(',')):
+        visible = kaist_frames(sequence, 'visible')
+        for frame in sorted(visible):
+            jobs.append(('copy', [visible[frame]], os.path.join(dest, sample_name(sequence, frame))))
+    return jobs
+
+
+def nir_jobs(opt):
+    jobs = []
+    nir = sorted(glob.glob(os.path.join(opt.nir_root, '*nir.tiff')))
+    rgb = sorted(glob.glob(os.path.join(opt.nir_root, '*rgb.tiff')))
+    for nir_path, rgb_path in zip(nir, rgb):
+        name = os.path.basename(nir_path)[:-len('nir.tiff')].rstrip('_') + '.jpg'
+        jobs.append(('nir_pair', [nir_path, rgb_path], os.path.join(opt.dataroot, opt.phase + 'A', name)))
+        jobs.append(('copy', [rgb_path], os.path.join(opt.dataroot, opt.phase + 'B', name)))
+    return jobs
+
+
+def load(path, mode, size):
+    img = Image.open(path)
+    if size is not None:
+        # JPEG draft decoding straight at (about) the target size
+        img.draft(mode, size)
+    img = img.convert(mode)
+    if size is not None and img.size != size:
+        img = img.resize(size, Image.BICUBIC)
+    return np.asarray(img)
+
+
+def convert(job):
+    kind, sources, out, size, quality = job
+    if kind == 'stack_v':
+        visible, lwir = load(sources[0], 'RGB', size), load(sources[1], 'RGB', size)
+        result = np.concatenate([visible, lwir], axis=0)
+    elif kind == 'nir_pair':
+        nir = load(sources[0], 'L', size)
+        green = load(sources[1], 'RGB', size)[:, :, 1]
+        result = np.stack([np.concatenate([nir, green], axis=1)] * 3, axis=2)
+    else:
+        result = load(sources[0], 'RGB', size)
+    tmp = out + '.tmp'
+    Image.fromarray(result).save(tmp, 'JPEG', quality=quality)
+    os.replace(tmp, out)
+    return out, [[s, os.stat(s).st_mtime_ns] for s in sources], size, quality
+
+
+def read_journal(path):
+    done = {}
+    if os.path.isfile(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:  # last line of an interrupted run
+                    continue
+                done[entry['out']] = entry
+    return done
+
+
+def up_to_date(out, sources, size, quality, done):
+    entry = done.get(out)
+    if not os.path.isfile(out) or entry is None:
+        return False
+    # written at another resolution or quality
+    if entry.get('size') != (list(size) if size is not None else None) or entry.get('quality') != quality:
+        return False
+    stamps = [[s, os.stat(s).st_mtime_ns] for s in sources]
+    if entry['src'] == stamps:
+        return True
+    out_mtime = os.stat(out).st_mtime_ns
+    return all(mtime <= out_mtime for _, mtime in stamps)
+
+
+def main(argv=None):
+    opt = parse_args(argv)
+    size = (opt.width, opt.height) if opt.width > 0 and opt.height > 0 else None
+    jobs = {'day': day_jobs, 'night': night_jobs, 'nir': nir_jobs}[opt.source](opt)
+    for d in set(os.path.dirname(out) for _, _, out in jobs):
+        if not os.path.isdir(d):
+            os.makedirs(d)
+
+    journal_path = os.path.join(opt.dataroot, JOURNAL)
+    done = read_journal(journal_path)
+    todo = [(kind, sources, out, size, opt.quality) for kind, sources, out in jobs
+            if not up_to_date(out, sources, size, opt.quality, done)]
+    print('%s: %d outputs, %d up to date, %d to convert' % (opt.source, len(jobs), len(jobs) - len(todo), len(todo)))
+
+    with open(journal_path, 'a') as journal:
+        pool = Pool(opt.nThreads)
+        for i, (out, stamps, size, quality) in enumerate(pool.imap_unordered(convert, todo, chunksize=8)):
+            journal.write(json.dumps({'out': out, 'src': stamps, 'size': size, 'quality': quality}) + '\n')
+            if (i + 1) % 100 == 0 or i + 1 == len(todo):
+                journal.flush()
+                print('    Processed: %d/%d' % (i + 1, len(todo)))
+        pool.close()
+        pool.join()
+
+    if opt.format == 'shards':
+        from data.image_folder import make_dataset
+        from data.shards import write_shards
+        for side in sorted(set(os.path.basename(os.path.dirname(out)) for _, _, out in jobs)):
+            paths = sorted(make_dataset(os.path.join(opt.dataroot, side)))
+            write_shards(paths, os.path.join(opt.dataroot, 'shards'), side, opt.shard_size)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,14 @@
+# Checks the images of the dataset folders ahead of a long run, e.g.
+#   python prescan.py --dataroot ./datasets/Day2Night --nThreads 16
+# Takes the same options as train.py/test.py. Broken images are listed in
+# [folder]/quarantine.json and left out by the datasets; --prescan does the
+# same check when the dataset is created.
+from options.train_options import TrainOptions
+from data.base_dataset import get_cache_dir, get_dataset_dirs
+from data.prescan import prescan
+
+opt = TrainOptions().parse()
+quarantined = 0
+for dir in get_dataset_dirs(opt):
+    quarantined += len(prescan(dir, get_cache_dir(opt), num_workers=max(1, opt.nThreads)))
+print('%d images quarantined' % quarantined)
@@ -1,14 +1,21 @@
 import time
 import os
+import torch
 from options.test_options import TestOptions
 from data.data_loader import CreateDataLoader
 from models.models import create_model
+from models.networks import get_downsampling_factor
 from util.visualizer import Visualizer
 from util import html
 
 opt = TestOptions().parse()
-opt.nThreads = 1  # test code only supports nThreads = 1
-opt.batchSize = 1  # test code only supports batchSize = 1
+if opt.bucketed:
+    # batches only hold images of one padded size, outputs are cropped back
+    if opt.bucket_multiple <= 0:
+        opt.bucket_multiple = get_downsampling_factor('resnetMM' if opt.model == 'cycle_gan' else opt.which_model_netG)
+else:
+    opt.nThreads = 1  # test code only supports nThreads = 1 without --bucketed
+    opt.batchSize = 1  # test code only supports batchSize = 1 without --bucketed
 opt.serial_batches = True  # no shuffle
 opt.no_flip = True  # no flip
 
@@ -20,14 +27,19 @@ visualizer = Visualizer(opt)
 web_dir = os.path.join(opt.results_dir, opt.name, '%s_%s' % (opt.phase, opt.which_epoch))
 webpage = html.HTML(web_dir, 'Experiment = %s, Phase = %s, Epoch = %s' % (opt.name, opt.phase, opt.which_epoch))
 # test
+num_images = 0
 for i, data in enumerate(dataset):
-    if i >= opt.how_many:
+    if num_images >= opt.how_many:
         break
     model.set_input(data)
-    model.test()
-    visuals = model.get_current_visuals()
-    img_path = model.get_image_paths()
-    print('process image... %s' % img_path)
-    visualizer.save_images(webpage, visuals, img_path)
+    with torch.no_grad():
+        model.test()
+    img_paths = model.get_image_paths()
+    for j in range(min(len(img_paths), opt.how_many - num_images)):
+        visuals = model.get_current_visuals(j)
+        img_path = img_paths[j:j + 1]
+        print('process image... %s' % img_path)
+        visualizer.save_images(webpage, visuals, img_path)
+    num_images += len(img_paths)
 
 webpage.save()
@@ -16,14 +16,19 @@ total_steps = 0
 
 for epoch in range(opt.epoch_count, opt.niter + opt.niter_decay + 1):
     epoch_start_time = time.time()
-    epoch_iter = 0
+    epoch_iter = opt.resume_iter if epoch == opt.epoch_count else 0
 
     for i, data in enumerate(dataset):
         iter_start_time = time.time()
+        # --echo repeats of a batch are not new samples
+        fresh = not data.get('echo', 0)
         total_steps += opt.batchSize
-        epoch_iter += opt.batchSize
+        if fresh:
+            epoch_iter += opt.batchSize
         model.set_input(data)
         model.optimize_parameters()
+        if fresh:
+            data_loader.record_losses(data, model.get_sample_losses())
 
         if total_steps % opt.display_freq == 0:
             visualizer.display_current_results(model.get_current_visuals(), epoch)
@@ -31,7 +36,7 @@ for epoch in range(opt.epoch_count, opt.niter + opt.niter_decay + 1):
         if total_steps % opt.print_freq == 0:
             errors = model.get_current_errors()
             t = (time.time() - iter_start_time) / opt.batchSize
-            visualizer.print_current_errors(epoch, epoch_iter, errors, t)
+            visualizer.print_current_errors(epoch, epoch_iter, errors, t, data_loader.data_wait_ms())
             if opt.display_id > 0:
                 visualizer.plot_current_errors(epoch, float(epoch_iter) / dataset_size, opt, errors)
 
@@ -48,4 +53,11 @@ for epoch in range(opt.epoch_count, opt.niter + opt.niter_decay + 1):
 
     print('End of epoch %d / %d \t Time Taken: %d sec' %
           (epoch, opt.niter + opt.niter_decay, time.time() - epoch_start_time))
+    cache_stats = data_loader.shm_cache_stats()
+    if cache_stats is not None:
+        print('shm cache: %(hits)d hits, %(misses)d misses, %(evictions)d evictions, %(used)d/%(slots)d slots' %
+              cache_stats)
+    echo_factor = data_loader.echo_factor()
+    if echo_factor is not None:
+        print('data echoing: %.2f steps per loaded batch' % echo_factor)
     model.update_learning_rate()
@@ -10,12 +10,24 @@ import collections
 
 # Converts a Tensor into a Numpy array
 # |imtype|: the desired type of the converted numpy array
-def tensor2im(image_tensor, imtype=np.uint8):
-    image_numpy = image_tensor[0].cpu().float().numpy()
+# |index|: which image of the batch, |size|: (height, width) to crop it to,
+# e.g. to remove the padding of bucketed batches, |normalization|: the
+# (mean, std) the image was normalized with, None for the fixed [-1, 1]
+def tensor2im(image_tensor, imtype=np.uint8, index=0, size=None, normalization=None):
+    image_tensor = image_tensor[index]
+    if size is not None:
+        image_tensor = image_tensor[:, :size[0], :size[1]]
+    image_numpy = image_tensor.cpu().float().numpy()
     if image_numpy.shape[0] == 1:
         image_numpy = np.tile(image_numpy, (3, 1, 1))
-    image_numpy = (np.transpose(image_numpy, (1, 2, 0)) + 1) / 2.0 * 255.0
-    return image_numpy.astype(imtype)
+    image_numpy = np.transpose(image_numpy, (1, 2, 0))
+    if normalization is None:
+        image_numpy = (image_numpy + 1) / 2.0 * 255.0
+    else:
+        mean, std = [np.asarray(v) for v in normalization]
+        image_numpy = (image_numpy * std + mean) * 255.0
+    # out of range values would wrap around in the uint8 cast
+    return np.clip(image_numpy, 0, 255).astype(imtype)
 
 
 def diagnose_network(net, name='network'):
@@ -109,8 +109,11 @@ class Visualizer():
             win=self.display_id)
 
     # errors: same format as |errors| of plotCurrentErrors
-    def print_current_errors(self, epoch, i, errors, t):
-        message = '(epoch: %d, iters: %d, time: %.3f) ' % (epoch, i, t)
+    def print_current_errors(self, epoch, i, errors, t, t_data=None):
+        if t_data is None:
+            message = '(epoch: %d, iters: %d, time: %.3f) ' % (epoch, i, t)
+        else:
+            message = '(epoch: %d, iters: %d, time: %.3f, data: %.1fms) ' % (epoch, i, t, t_data)
         for k, v in errors.items():
             message += '%s: %.3f ' % (k, v)
 
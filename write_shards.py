@@ -0,0 +1,20 @@
+# Packs [phase]A and [phase]B into fixed-size tar shards for --dataset_mode sharded, e.g.
+#   python write_shards.py --dataroot ./datasets/Day2Night --phase train --shard_size 1000
+import argparse
+import os
+from data.image_folder import make_dataset
+from data.shards import write_shards
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--dataroot', required=True, help='path to images (should have subfolders trainA, trainB, etc)')
+parser.add_argument('--phase', type=str, default='train', help='train, val, test, etc')
+parser.add_argument('--shard_dir', type=str, default='', help='where to write the shards. Defaults to [dataroot]/shards')
+parser.add_argument('--shard_size', type=int, default=1000, help='# of samples per shard')
+opt = parser.parse_args()
+
+shard_dir = opt.shard_dir or os.path.join(opt.dataroot, 'shards')
+for side in ['A', 'B']:
+    name = opt.phase + side
+    paths = sorted(make_dataset(os.path.join(opt.dataroot, name)))
+    print('%s: %d images' % (name, len(paths)))
+    write_shards(paths, shard_dir, name, opt.shard_size)